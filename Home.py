@@ -1,8 +1,8 @@
 # ==================================================================
 # Libraries
 # ==================================================================
-from PIL import Image
 import streamlit as st
+from toeat.ui import sidebar_header
 
 # ==================================================================
 # Configurações
@@ -11,14 +11,10 @@ st.set_page_config(page_title = 'Home',
                    page_icon = '🍎',
                   layout= 'centered')
 
-st.sidebar.image(Image.open('ftcfork4.png'), width=250)
-
 # ==================================================================
 # Barra Lateral
 # ==================================================================
-
-st.sidebar.markdown( '# ToEat Restaurants' ) 
-st.sidebar.markdown( """---""" )
+sidebar_header()
 
 # ==================================================================
 # Layout
@@ -0,0 +1,95 @@
+"""
+Benchmark do modo com todas as culinárias: índice invertido (toeat/ranking.py) contra o DataFrame explodido.
+
+    python -m benchmarks.bench_cuisines [--sizes 10000 100000 1000000]
+
+Os restaurantes são sorteados do dataset limpo (com a lista all_cuisines). Para
+cada tamanho compara as duas formas de contar todas as culinárias de cada
+restaurante: CuisineListRankings, que guarda um int32 por par
+restaurante/culinária, e o explode das listas num DataFrame com as colunas da
+tabela de restaurantes, uma linha por par. Mede o tempo de montagem, o pico de
+memória (tracemalloc) durante a montagem, a memória que fica e o tempo da nota
+média por culinária nos países padrão das páginas; confere que as duas dão o
+mesmo resultado.
+"""
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from toeat.data import EXCLUDED_CUISINES, load_dataset
+from toeat.ranking import CUISINE_LIST_COLUMNS, TOP_RESTAURANT_COLUMNS, CuisineListRankings
+
+DEFAULT_COUNTRIES = ['Brazil', 'England', 'Qatar', 'South Africa', 'Canada', 'Australia']
+
+def sample_restaurants(n, seed=0):
+    df1 = load_dataset( columns=CUISINE_LIST_COLUMNS ).sample( n, replace=True, random_state=seed ).reset_index( drop=True )
+    df1['restaurant_id'] = np.arange( n, dtype=df1['restaurant_id'].dtype )
+    return df1
+
+def explode_cuisines(df1):
+    """
+    Esta função monta a versão explodida: uma linha por restaurante e culinária listada
+    """
+    lists = df1['all_cuisines'].astype( str ).str.split( ',' )
+    exploded = df1.loc[:, TOP_RESTAURANT_COLUMNS].assign( cuisines=lists ).explode( 'cuisines' )
+    exploded['cuisines'] = exploded['cuisines'].str.strip()
+    exploded = exploded.loc[~exploded['cuisines'].isin( EXCLUDED_CUISINES ), :]
+    exploded = exploded.reset_index().drop_duplicates( ['index', 'cuisines'] ).set_index( 'index' )
+    exploded['cuisines'] = exploded['cuisines'].astype( 'category' )
+    return exploded
+
+def explode_ratings(exploded, countries):
+    df_aux = exploded.loc[exploded['country'].isin( countries ), ['cuisines', 'aggregate_rating']]
+    return df_aux.groupby( 'cuisines', observed=True )['aggregate_rating'].mean()
+
+def rankings_nbytes(rankings):
+    return rankings.index.nbytes + rankings.value_ids.nbytes + rankings.rank.nbytes + rankings.country_codes.nbytes
+
+def measure(build):
+    """
+    Retorna (resultado, segundos, pico de memória em bytes) da montagem
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, seconds, peak
+
+def best_of(func, repeat=5):
+    seconds = []
+    for _ in range( repeat ):
+        start = time.perf_counter()
+        result = func()
+        seconds.append( time.perf_counter() - start )
+    return result, min( seconds )
+
+def main(argv=None):
+    parser = argparse.ArgumentParser( description='Compara o índice invertido de culinárias com o DataFrame explodido.' )
+    parser.add_argument( '--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000] )
+    args = parser.parse_args( argv )
+
+    print( f"{'restaurantes':>12} {'forma':<10} {'pares':>10} {'montagem s':>11} {'pico MB':>9} {'fica MB':>9} {'consulta ms':>12}" )
+    for n in args.sizes:
+        df1 = sample_restaurants( n )
+        rankings, index_seconds, index_peak = measure( lambda: CuisineListRankings( df1 ) )
+        exploded, explode_seconds, explode_peak = measure( lambda: explode_cuisines( df1 ) )
+
+        index_result, index_query = best_of( lambda: rankings._cuisine_top( len( rankings.values ), DEFAULT_COUNTRIES, None, False ) )
+        explode_result, explode_query = best_of( lambda: explode_ratings( exploded, DEFAULT_COUNTRIES ) )
+        expected = explode_result.sort_index()
+        got = index_result.set_index( 'cuisines' )['aggregate_rating'].sort_index()
+        if list( expected.index ) != list( got.index ) or not np.allclose( expected.to_numpy(), got.to_numpy() ):
+            raise AssertionError( f'{n}: notas médias do índice diferem das do explode' )
+
+        explode_bytes = exploded.memory_usage( index=True, deep=True ).sum()
+        for name, pairs, seconds, peak, size, query in [
+                ('índice', len( rankings.index ), index_seconds, index_peak, rankings_nbytes( rankings ), index_query),
+                ('explode', len( exploded ), explode_seconds, explode_peak, explode_bytes, explode_query)]:
+            print( f'{n:>12} {name:<10} {pairs:>10} {seconds:>11.3f} {peak / 2**20:>9.1f} {size / 2**20:>9.1f} {query * 1000:>12.2f}' )
+
+if __name__ == '__main__':
+    main()
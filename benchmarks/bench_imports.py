@@ -0,0 +1,131 @@
+"""
+Relatório do tempo de import de cada página do dashboard, para comparar a partida antes e depois de uma mudança.
+
+    python -m benchmarks.bench_imports [--repeat 5] [--baseline <commit>]
+
+Para cada página roda, num processo Python novo, só as linhas de import do
+topo do arquivo e mede duas coisas: 'frio' inclui o import do Streamlit (a
+partida do servidor), e 'página' começa com o Streamlit já carregado, que é o
+que a primeira visita à página paga no servidor em execução. Também lista quais
+bibliotecas pesadas (HEAVY_MODULES) ficaram carregadas. Vale a mediana das
+repetições.
+
+Com --baseline, a mesma medição roda numa cópia do repositório naquele commit
+(git archive num diretório temporário) e o relatório mostra as duas colunas.
+As repetições alternam as duas cópias, para que a variação da máquina (disco,
+outros processos) pese igual nos dois lados, e a primeira execução de cada uma,
+que ainda grava os .pyc, é descartada. O 'frio' varia ~100 ms entre rodadas
+nesta máquina; compare diferenças maiores que isso.
+"""
+import argparse
+import ast
+import glob
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+
+PAGES = ['Home.py'] + sorted( glob.glob( 'pages/*.py' ) )
+
+# Bibliotecas cujo import custa dezenas ou centenas de milissegundos
+HEAVY_MODULES = ['plotly.express', 'folium', 'streamlit_folium', 'inflection', 'pyarrow.feather']
+
+MEASURE = """
+import json, sys, time
+{preload}
+start = time.perf_counter()
+{imports}
+seconds = time.perf_counter() - start
+print( json.dumps( {{'ms': seconds * 1000, 'heavy': [m for m in {heavy!r} if m in sys.modules]}} ) )
+"""
+
+def page_imports(source):
+    """
+    Esta função retorna as linhas de import do nível de topo do código da página
+    """
+    tree = ast.parse( source )
+    return '\n'.join( ast.get_source_segment( source, node ) for node in tree.body
+                      if isinstance( node, (ast.Import, ast.ImportFrom) ) )
+
+def page_code(root, page, preload):
+    """
+    Esta função monta o script que mede os imports da página (None se a página não existe em root)
+    """
+    if not os.path.exists( os.path.join( root, page ) ):
+        return None
+    with open( os.path.join( root, page ), encoding='utf-8' ) as file:
+        return MEASURE.format( preload='import streamlit' if preload else '', imports=page_imports( file.read() ),
+                               heavy=HEAVY_MODULES )
+
+def run_code(root, code):
+    env = dict( os.environ, PYTHONPATH=root )
+    result = subprocess.run( [sys.executable, '-c', code], cwd=root, env=env, capture_output=True, text=True, check=True )
+    return json.loads( result.stdout.splitlines()[-1] )
+
+def measure(roots, page, preload, repeat):
+    """
+    Esta função roda os imports da página repeat vezes em processos novos, alternando as raízes a cada repetição;
+    retorna, para cada raiz, (mediana em ms, bibliotecas pesadas carregadas) ou None se a página não existe nela
+    """
+    codes = [page_code( root, page, preload ) for root in roots]
+    runs = [[] for _ in roots]
+    for number in range( repeat + 1 ):
+        for root, code, root_runs in zip( roots, codes, runs ):
+            if code is not None:
+                run = run_code( root, code )
+                # A primeira execução grava os .pyc e fica de fora
+                if number:
+                    root_runs.append( run )
+    return [(statistics.median( run['ms'] for run in root_runs ), root_runs[-1]['heavy']) if root_runs else None
+            for root_runs in runs]
+
+def report(roots, repeat):
+    """
+    Esta função mede todas as páginas em cada raiz; retorna um dicionário página -> {'cold', 'page'} por raiz
+    """
+    results = [{} for _ in roots]
+    for page in PAGES:
+        for kind, preload in [('cold', False), ('page', True)]:
+            for result, measured in zip( results, measure( roots, page, preload, repeat ) ):
+                if measured is not None:
+                    result.setdefault( page, {} )[kind] = measured
+    return results
+
+def checkout(commit, directory):
+    """
+    Esta função extrai os arquivos do commit em directory
+    """
+    archive = os.path.join( directory, 'baseline.tar' )
+    subprocess.run( ['git', 'archive', '--output', archive, commit], check=True )
+    with tarfile.open( archive ) as tar:
+        tar.extractall( directory )
+    return directory
+
+def main(argv=None):
+    parser = argparse.ArgumentParser( description='Mede o tempo de import de cada página.' )
+    parser.add_argument( '--repeat', type=int, default=5 )
+    parser.add_argument( '--baseline', default=None, help='commit para comparar (ex.: HEAD~1)' )
+    args = parser.parse_args( argv )
+
+    with tempfile.TemporaryDirectory( prefix='toeat-imports-' ) as tmp_dir:
+        roots = [os.getcwd()] + ([checkout( args.baseline, tmp_dir )] if args.baseline else [])
+        current, baseline = (report( roots, args.repeat ) + [None])[:2]
+
+    for page, result in current.items():
+        print( page )
+        for kind, label in [('cold', 'frio'), ('page', 'página')]:
+            ms, heavy = result[kind]
+            line = f'  {label:<7} {ms:>8.0f} ms'
+            if baseline and page in baseline:
+                base_ms, base_heavy = baseline[page][kind]
+                line += f'  (antes {base_ms:>6.0f} ms, {ms - base_ms:+6.0f} ms)'
+                heavy_text = f"{', '.join( heavy ) or '-'} (antes: {', '.join( base_heavy ) or '-'})"
+            else:
+                heavy_text = ', '.join( heavy ) or '-'
+            print( f'{line}  pesadas: {heavy_text}' )
+
+if __name__ == '__main__':
+    main()
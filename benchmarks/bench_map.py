@@ -0,0 +1,60 @@
+"""
+Benchmark de tempo e tamanho do HTML dos construtores do mapa da Main Page.
+
+    python -m benchmarks.bench_map [--sizes 10000 100000 1000000] [--legacy-max 100000]
+
+Os restaurantes são sorteados do dataset real (com reposição) e deslocados
+alguns metros, mantendo as distribuições de países, culinárias e notas.
+restaurant_map (um folium.Marker por linha) é lento demais para 1M pontos,
+por isso só roda até --legacy-max.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from toeat.data import load_dataset
+from toeat.maps import fast_restaurant_map, restaurant_map
+
+BUILDERS = {
+    'restaurant_map': restaurant_map,
+    'fast_restaurant_map': fast_restaurant_map,
+    }
+
+def synthetic_restaurants(n, seed=0):
+    """
+    Sorteia n restaurantes do dataset limpo e desloca as coordenadas (~1 km)
+    """
+    rng = np.random.default_rng( seed )
+    df1 = load_dataset().sample( n, replace=True, random_state=seed ).reset_index( drop=True )
+    df1['latitude'] = (df1['latitude'] + rng.normal( 0, 0.01, n )).astype( df1['latitude'].dtype )
+    df1['longitude'] = (df1['longitude'] + rng.normal( 0, 0.01, n )).astype( df1['longitude'].dtype )
+    return df1
+
+def measure(builder, df1):
+    """
+    Retorna (segundos, bytes) para montar o mapa e serializar o HTML
+    """
+    start = time.perf_counter()
+    html = builder( df1 ).get_root().render()
+    return time.perf_counter() - start, len( html.encode() )
+
+def main(argv=None):
+    parser = argparse.ArgumentParser( description='Compara os construtores do mapa de restaurantes.' )
+    parser.add_argument( '--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000] )
+    parser.add_argument( '--legacy-max', type=int, default=100_000,
+                         help='maior tamanho em que restaurant_map é medido (padrão: %(default)s)' )
+    args = parser.parse_args( argv )
+
+    print( f"{'pontos':>10} {'construtor':<22} {'segundos':>10} {'MB':>10}" )
+    for n in args.sizes:
+        df1 = synthetic_restaurants( n )
+        for name, builder in BUILDERS.items():
+            if builder is restaurant_map and n > args.legacy_max:
+                print( f'{n:>10} {name:<22} {"pulado":>10} {"-":>10}' )
+                continue
+            seconds, size = measure( builder, df1 )
+            print( f'{n:>10} {name:<22} {seconds:>10.2f} {size / 1e6:>10.2f}' )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Benchmark da limpeza em paralelo (toeat/parallel.py) por quantidade de processos.
+
+    python -m benchmarks.bench_parallel [--scale 100] [--workers 1 2 4 8] [--repeat 1]
+
+Mede o pipeline serial (build_dataset e build_cube) e build_dataset_parallel
+com cada quantidade de processos sobre o CSV sintético de benchmarks/synthetic.py,
+confere que o resultado é igual ao serial e mostra o ganho. O ganho depende dos
+núcleos livres da máquina: com menos núcleos que processos, o custo de subir o
+pool e gravar as fatias em Arrow só aparece como perda.
+"""
+import argparse
+import os
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import write_synthetic
+from toeat.cube import build_cube
+from toeat.data import DATASET_PATH, build_dataset
+from toeat.parallel import build_dataset_parallel
+from toeat.schema import apply_schema
+
+def best_of(repeat, func):
+    """
+    Esta função roda func repeat vezes e retorna (menor tempo em segundos, último resultado)
+    """
+    best = None
+    for _ in range( repeat ):
+        start = time.perf_counter()
+        result = func()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min( best, seconds )
+    return best, result
+
+def serial(path):
+    df1 = apply_schema( build_dataset( path ) )
+    return df1, build_cube( df1 )
+
+def main(argv=None):
+    parser = argparse.ArgumentParser( description='Mede o ganho da limpeza em paralelo por quantidade de processos.' )
+    parser.add_argument( '--scale', type=int, default=100 )
+    parser.add_argument( '--workers', type=int, nargs='+', default=[1, 2, 4, 8] )
+    parser.add_argument( '--repeat', type=int, default=1 )
+    args = parser.parse_args( argv )
+
+    path = DATASET_PATH if args.scale == 1 else write_synthetic( args.scale )
+    serial_seconds, (expected, _) = best_of( args.repeat, lambda: serial( path ) )
+    print( f'x{args.scale}, {len( expected )} linhas limpas, {os.cpu_count()} núcleos' )
+    print( f"{'processos':>10} {'segundos':>10} {'ganho':>8}" )
+    print( f"{'serial':>10} {serial_seconds:>10.2f} {1:>7.2f}x" )
+    for workers in args.workers:
+        seconds, (df1, _, _) = best_of( args.repeat, lambda: build_dataset_parallel( path, workers ) )
+        pd.testing.assert_frame_equal( df1, expected, check_categorical=False )
+        print( f'{workers:>10} {seconds:>10.2f} {serial_seconds / seconds:>7.2f}x' )
+
+if __name__ == '__main__':
+    main()
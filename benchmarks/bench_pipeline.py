@@ -0,0 +1,182 @@
+"""
+Benchmark de cada etapa do pipeline das páginas, do CSV ao HTML do mapa.
+
+    python -m benchmarks.bench_pipeline [--scales 1 10 100 | --full] [--output arquivo.json] [--compare anterior.json]
+
+Para cada escala (1 = dataset original; as demais vêm de benchmarks/synthetic.py)
+mede separadamente: read_csv (já com os nomes do schema), enrich_columns, clean_code,
+apply_schema, o cubo e cada agregado dos gráficos, rankings, índices de filtro
+e o HTML dos mapas. O resultado vai para um JSON (por padrão
+benchmarks/results/pipeline-<commit>.json) com o commit, as versões e os
+segundos de cada etapa; --compare mostra a razão em relação a outro arquivo.
+Cada escala N confere que o dataset limpo tem N vezes os restaurant_id
+distintos do original limpo (ids perdidos ou repetidos invalidam a medição).
+
+Por padrão rodam as escalas DEFAULT_SCALES (1, 10 e 100). A escala 1000 (~7,5
+milhões de linhas brutas, CSV de ~1,9 GB) precisa de bem mais memória que as
+demais (na ordem de 16 GB), então fica de fora do padrão: --full roda
+FULL_SCALES (1, 10, 100 e 1000). restaurant_map só roda até --legacy-max linhas.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import write_synthetic
+from toeat import cube
+from toeat.data import DATASET_PATH, clean_code, enrich_columns
+from toeat.fx import load_fx_table
+from toeat.index import RowFilter, build_indexes
+from toeat.maps import fast_restaurant_map, map_html, restaurant_map
+from toeat.ranking import MAX_K, build_city_rankings, build_cuisine_rankings, build_restaurant_rankings
+from toeat.schema import PAGE_COLUMNS, apply_schema, read_dataset_csv
+
+RESULTS_DIR = os.path.join( 'benchmarks', 'results' )
+
+DEFAULT_SCALES = [1, 10, 100]
+# Inclui 1000x: só em máquinas com ~16 GB de memória livre
+FULL_SCALES = [1, 10, 100, 1000]
+
+# Filtros padrão das páginas
+DEFAULT_COUNTRIES = ['Brazil', 'England', 'Qatar', 'South Africa', 'Canada', 'Australia']
+DEFAULT_CUISINES = ['Italian', 'American', 'Arabian', 'Brazilian', 'Japanese', 'Cafe']
+
+CHART_ROLLUPS = [
+    cube.restaurants_per_country,
+    cube.cities_per_country,
+    cube.votes_per_country,
+    cube.cost_per_country_and_currency,
+    cube.city_table,
+    cube.rating_per_cuisine,
+    ]
+
+class StageTimer:
+    """
+    Guarda os segundos de cada etapa, na ordem em que rodaram
+    """
+    def __init__(self):
+        self.stages = {}
+
+    def run(self, stage, func, *args):
+        start = time.perf_counter()
+        result = func( *args )
+        self.stages[stage] = round( time.perf_counter() - start, 6 )
+        return result
+
+def clean_restaurants(path=DATASET_PATH):
+    """
+    Esta função retorna quantos restaurant_id distintos sobram da limpeza do CSV em path
+    """
+    return clean_code( enrich_columns( read_dataset_csv( path ) ) )['restaurant_id'].nunique()
+
+def run_pipeline(path, legacy_max, expected_restaurants=None):
+    """
+    Esta função roda as etapas sobre o CSV em path e retorna (segundos por etapa, linhas brutas, linhas limpas).
+
+    expected_restaurants, se dado, é a quantidade de restaurant_id distintos esperada no dataset limpo.
+    """
+    timer = StageTimer()
+    df0 = timer.run( 'read_csv', read_dataset_csv, path )
+    df1 = timer.run( 'enrich_columns', enrich_columns, df0 )
+    df1 = timer.run( 'clean_code', clean_code, df1 )
+    df1 = timer.run( 'apply_schema', lambda: apply_schema( df1.loc[:, PAGE_COLUMNS] ) )
+    restaurants = df1['restaurant_id'].nunique()
+    if expected_restaurants is not None and restaurants != expected_restaurants:
+        raise AssertionError( f'{path}: {restaurants} restaurant_id distintos no dataset limpo, esperados {expected_restaurants}' )
+
+    # Gráficos: cubo uma vez por versão do dataset e um rollup por gráfico
+    df_cube = timer.run( 'build_cube', cube.build_cube, df1 )
+    filtered = timer.run( 'filter_cube', cube.filter_cube, df_cube, DEFAULT_COUNTRIES )
+    for rollup in CHART_ROLLUPS:
+        timer.run( f'chart.{rollup.__name__}', rollup, filtered )
+    timer.run( 'chart.cost_per_country', cube.cost_per_country, filtered, load_fx_table() )
+
+    # Rankings "Top N" e melhor restaurante por culinária
+    city_rankings = timer.run( 'build_city_rankings', build_city_rankings, df1 )
+    restaurant_rankings = timer.run( 'build_restaurant_rankings', build_restaurant_rankings, df1 )
+    cuisine_rankings = timer.run( 'build_cuisine_rankings', build_cuisine_rankings, df1 )
+    timer.run( 'top.cities', lambda: city_rankings['restaurants'].top( MAX_K, country=DEFAULT_COUNTRIES ) )
+    timer.run( 'top.restaurants', lambda: restaurant_rankings.top( MAX_K, country=DEFAULT_COUNTRIES, cuisines=DEFAULT_CUISINES ) )
+    timer.run( 'top.cuisines', lambda: cuisine_rankings['best'].top( MAX_K, country=DEFAULT_COUNTRIES, cuisines=DEFAULT_CUISINES ) )
+    timer.run( 'best_per_cuisine', lambda: restaurant_rankings.first_per( 'cuisines', country=DEFAULT_COUNTRIES, cuisines=DEFAULT_CUISINES ) )
+
+    # Filtros da barra lateral e métricas gerais
+    indexes = timer.run( 'build_indexes', build_indexes, df1 )
+    view = timer.run( 'filter_rows', lambda: RowFilter( df1, indexes ).select( 'country', DEFAULT_COUNTRIES ).view() )
+    timer.run( 'general_metrics', lambda: (view['country'].nunique(), view['restaurant_id'].nunique(), view['city'].nunique(),
+                                           view['votes'].sum(), len( view['cuisines'].unique() )) )
+
+    # Mapas da Main Page, com os países padrão
+    df_map = view.frame()
+    timer.run( 'map_html.fast_restaurant_map', lambda: map_html( fast_restaurant_map( df_map ) ) )
+    if len( df_map ) <= legacy_max:
+        timer.run( 'map_html.restaurant_map', lambda: map_html( restaurant_map( df_map ) ) )
+    return timer.stages, len( df0 ), len( df1 )
+
+def git_commit():
+    try:
+        return subprocess.run( ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def compare(results, previous):
+    """
+    Esta função imprime a razão entre os tempos atuais e os de um resultado anterior (> 1 = mais lento)
+    """
+    old = {(run['scale'], stage): seconds for run in previous['runs'] for stage, seconds in run['stages'].items()}
+    print( f"\nComparação com {previous['meta']['commit']}:" )
+    for run in results['runs']:
+        for stage, seconds in run['stages'].items():
+            before = old.get( (run['scale'], stage) )
+            if before:
+                print( f"x{run['scale']:<6} {stage:<36} {seconds / before:>7.2f}" )
+
+def main(argv=None):
+    parser = argparse.ArgumentParser( description='Mede cada etapa do pipeline em datasets sintéticos de várias escalas.' )
+    scales = parser.add_mutually_exclusive_group()
+    scales.add_argument( '--scales', type=int, nargs='+', default=DEFAULT_SCALES, help='escalas (padrão: %(default)s)' )
+    scales.add_argument( '--full', action='store_const', dest='scales', const=FULL_SCALES,
+                         help=f'roda as escalas {FULL_SCALES} (a de 1000x precisa de ~16 GB)' )
+    parser.add_argument( '--output', help='JSON de resultados (padrão: benchmarks/results/pipeline-<commit>.json)' )
+    parser.add_argument( '--compare', help='JSON de uma rodada anterior para comparar' )
+    parser.add_argument( '--legacy-max', type=int, default=20_000,
+                         help='maior quantidade de linhas no mapa em que restaurant_map é medido (padrão: %(default)s)' )
+    args = parser.parse_args( argv )
+
+    commit = git_commit()
+    results = {
+        'meta': {
+            'commit': commit,
+            'date': datetime.datetime.now().isoformat( timespec='seconds' ),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'machine': platform.machine(),
+            },
+        'runs': [],
+        }
+    restaurants = clean_restaurants()
+    for scale in args.scales:
+        path = DATASET_PATH if scale == 1 else write_synthetic( scale )
+        stages, rows_raw, rows_clean = run_pipeline( path, args.legacy_max, restaurants * scale )
+        results['runs'].append( {'scale': scale, 'rows_raw': rows_raw, 'rows_clean': rows_clean, 'stages': stages} )
+        print( f'\nx{scale}: {rows_raw} linhas brutas, {rows_clean} limpas' )
+        for stage, seconds in stages.items():
+            print( f'  {stage:<36} {seconds:>10.4f} s' )
+
+    output = args.output or os.path.join( RESULTS_DIR, f'pipeline-{commit}.json' )
+    os.makedirs( os.path.dirname( output ) or '.', exist_ok=True )
+    with open( output, 'w' ) as file:
+        json.dump( results, file, indent=2 )
+    print( f'\nResultados em {output}' )
+
+    if args.compare:
+        with open( args.compare ) as file:
+            compare( results, json.load( file ) )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark das consultas do índice espacial (toeat/spatial.py) contra a varredura completa.
+
+    python -m benchmarks.bench_spatial [--points 1000000] [--queries 200]
+
+Os pontos vêm de bench_map.synthetic_restaurants (restaurantes reais sorteados
+e deslocados ~1 km), e os centros das consultas são restaurantes sorteados,
+como os cliques e janelas de um usuário. Para cada tipo de consulta mede a
+latência p50/p95 do índice e da varredura (numpy vetorizado sobre todos os
+pontos) e confere que os resultados são iguais.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.bench_map import synthetic_restaurants
+from toeat.spatial import GridIndex, haversine_km
+
+# (nome, meia altura e meia largura da janela em graus): mapa de uma cidade e de um país
+BBOX_QUERIES = [('bbox cidade', 0.15, 0.2), ('bbox país', 5.0, 7.5)]
+RADIUS_QUERIES = [1, 10]
+NEAREST_QUERIES = [10]
+
+def scan_bbox(latitude, longitude, south, west, north, east):
+    return np.flatnonzero( (latitude >= south) & (latitude <= north) & (longitude >= west) & (longitude <= east) )
+
+def scan_radius(latitude, longitude, lat, lon, km):
+    distances = haversine_km( lat, lon, latitude, longitude )
+    return np.sort( np.flatnonzero( distances <= km ) )
+
+def scan_nearest(latitude, longitude, lat, lon, k):
+    distances = haversine_km( lat, lon, latitude, longitude )
+    nearest = np.argpartition( distances, k )[:k]
+    return np.sort( distances[nearest] )
+
+def percentiles(seconds):
+    return np.percentile( np.array( seconds ) * 1000, [50, 95] )
+
+def run(name, index_query, scan_query, centers, same):
+    """
+    Esta função mede as duas versões da consulta em cada centro e imprime p50/p95 em ms
+    """
+    index_seconds, scan_seconds = [], []
+    for lat, lon in centers:
+        start = time.perf_counter()
+        got = index_query( lat, lon )
+        index_seconds.append( time.perf_counter() - start )
+        start = time.perf_counter()
+        expected = scan_query( lat, lon )
+        scan_seconds.append( time.perf_counter() - start )
+        if not same( got, expected ):
+            raise AssertionError( f'{name}: resultado do índice difere da varredura em ({lat}, {lon})' )
+    index_p50, index_p95 = percentiles( index_seconds )
+    scan_p50, scan_p95 = percentiles( scan_seconds )
+    print( f'{name:<16} {index_p50:>9.3f} {index_p95:>9.3f} {scan_p50:>9.2f} {scan_p95:>9.2f} {scan_p50 / index_p50:>8.0f}x' )
+
+def main(argv=None):
+    parser = argparse.ArgumentParser( description='Mede a latência das consultas do índice espacial.' )
+    parser.add_argument( '--points', type=int, default=1_000_000 )
+    parser.add_argument( '--queries', type=int, default=200 )
+    args = parser.parse_args( argv )
+
+    df1 = synthetic_restaurants( args.points )
+    latitude = df1['latitude'].to_numpy( dtype=np.float64 )
+    longitude = df1['longitude'].to_numpy( dtype=np.float64 )
+    start = time.perf_counter()
+    index = GridIndex( latitude, longitude )
+    print( f'{args.points} pontos; índice montado em {time.perf_counter() - start:.2f} s ({index.nbytes / 2**20:.1f} MB)\n' )
+
+    rng = np.random.default_rng( 1 )
+    centers = [(latitude[i], longitude[i]) for i in rng.integers( 0, args.points, args.queries )]
+    print( f"{'consulta':<16} {'p50 ms':>9} {'p95 ms':>9} {'scan p50':>9} {'scan p95':>9} {'ganho':>9}" )
+    for name, half_height, half_width in BBOX_QUERIES:
+        run( name,
+             lambda lat, lon: index.bbox( lat - half_height, lon - half_width, lat + half_height, lon + half_width ),
+             lambda lat, lon: scan_bbox( latitude, longitude, lat - half_height, lon - half_width, lat + half_height, lon + half_width ),
+             centers, np.array_equal )
+    for km in RADIUS_QUERIES:
+        run( f'raio {km} km',
+             lambda lat, lon: np.sort( index.radius( lat, lon, km )[0] ),
+             lambda lat, lon: scan_radius( latitude, longitude, lat, lon, km ),
+             centers, np.array_equal )
+    for k in NEAREST_QUERIES:
+        run( f'{k} mais próximos',
+             lambda lat, lon: index.nearest( lat, lon, k )[1],
+             lambda lat, lon: scan_nearest( latitude, longitude, lat, lon, k ),
+             centers, np.allclose )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Teste de carga da API JSON (toeat/api.py): requisições por segundo e latência.
+
+    python -m benchmarks.load_api [--concurrency 16] [--duration 10] [--url http://127.0.0.1:8600]
+
+Sem --url, sobe a API num subprocesso numa porta livre e a encerra no fim.
+Cada rodada percorre as rotas de ROUTES em ciclo, primeiro com GET normal e
+depois com GET condicional (If-None-Match com o ETag já recebido), que deve
+voltar 304 sem recalcular nada.
+"""
+import argparse
+import asyncio
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import quote
+
+import numpy as np
+from tornado.httpclient import AsyncHTTPClient, HTTPClientError
+
+# Mesmos filtros padrão das páginas
+COUNTRIES = quote( 'Brazil,England,Qatar,South Africa,Canada,Australia' )
+CUISINES = quote( 'Italian,American,Arabian,Brazilian,Japanese,Cafe' )
+
+ROUTES = [
+    f'/api/metrics?country={COUNTRIES}',
+    f'/api/countries/restaurants?country={COUNTRIES}',
+    f'/api/countries/cost?country={COUNTRIES}',
+    f'/api/cities/restaurants?k=10&country={COUNTRIES}',
+    f'/api/cities/cuisines?k=10&country={COUNTRIES}',
+    f'/api/restaurants/top?k=10&country={COUNTRIES}&cuisine={CUISINES}',
+    f'/api/cuisines/best?k=10&country={COUNTRIES}&cuisine={CUISINES}',
+    '/api/cuisines/worst?k=10',
+    ]
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind( ('127.0.0.1', 0) )
+        return sock.getsockname()[1]
+
+async def wait_ready(client, url, timeout=120):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            await client.fetch( url + '/api/version' )
+            return
+        except (ConnectionError, HTTPClientError, OSError):
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep( 0.2 )
+
+async def run_load(client, url, concurrency, duration, etags=None):
+    """
+    Dispara requisições com concurrency clientes por duration segundos; retorna (latências, status)
+    """
+    latencies = []
+    statuses = {}
+    deadline = time.perf_counter() + duration
+
+    async def worker(offset):
+        i = offset
+        while time.perf_counter() < deadline:
+            route = ROUTES[i % len( ROUTES )]
+            headers = {'If-None-Match': etags[route]} if etags else None
+            start = time.perf_counter()
+            response = await client.fetch( url + route, headers=headers, raise_error=False )
+            latencies.append( time.perf_counter() - start )
+            statuses[response.code] = statuses.get( response.code, 0 ) + 1
+            i += 1
+
+    await asyncio.gather( *[worker( n ) for n in range( concurrency )] )
+    return np.array( latencies ), statuses
+
+def report(label, latencies, statuses, duration):
+    p50, p95, p99 = np.percentile( latencies * 1000, [50, 95, 99] )
+    print( f'{label:<12} {len( latencies ) / duration:>10.0f} {p50:>9.1f} {p95:>9.1f} {p99:>9.1f}  {statuses}' )
+
+async def main_async(args):
+    AsyncHTTPClient.configure( None, max_clients=args.concurrency )
+    client = AsyncHTTPClient()
+    server = None
+    url = args.url
+    if url is None:
+        port = free_port()
+        url = f'http://127.0.0.1:{port}'
+        server = subprocess.Popen( [sys.executable, '-m', 'toeat.api', '--port', str( port ), '--csv', args.csv] )
+    try:
+        await wait_ready( client, url )
+        etags = {}
+        for route in ROUTES:
+            response = await client.fetch( url + route )
+            etags[route] = response.headers['Etag']
+
+        print( f"{'modo':<12} {'req/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}  status" )
+        latencies, statuses = await run_load( client, url, args.concurrency, args.duration )
+        report( 'GET', latencies, statuses, args.duration )
+        latencies, statuses = await run_load( client, url, args.concurrency, args.duration, etags )
+        report( 'condicional', latencies, statuses, args.duration )
+    finally:
+        client.close()
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser( description='Mede requisições por segundo da API JSON.' )
+    parser.add_argument( '--url', help='API já em execução (padrão: sobe uma local)' )
+    parser.add_argument( '--csv', default='dataset/zomato.csv', help='CSV da API local (padrão: %(default)s)' )
+    parser.add_argument( '--concurrency', type=int, default=16 )
+    parser.add_argument( '--duration', type=float, default=10.0, help='segundos por rodada (padrão: %(default)s)' )
+    args = parser.parse_args( argv )
+    asyncio.run( main_async( args ) )
+
+if __name__ == '__main__':
+    main()
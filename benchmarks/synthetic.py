@@ -0,0 +1,76 @@
+"""
+Gerador de datasets sintéticos no formato do CSV do Zomato, em escala.
+
+    python -m benchmarks.synthetic --scale 100 [--output benchmarks/data/zomato_x100-v2.csv]
+
+O CSV de escala N tem N cópias do dataset original, com as mesmas colunas e as
+mesmas distribuições de país, cidade, culinária, preço e nota. Na cópia i > 0
+os restaurant_id são renumerados de forma densa, depois do maior id do
+original: o id novo depende só do restaurante e da cópia, então as linhas
+duplicadas do original continuam duplicadas (a limpeza tem o mesmo trabalho em
+qualquer escala) e os ids cabem no int32 até escalas de centenas de milhares
+(na escala 1000, o maior id fica em ~26 milhões). As coordenadas andam alguns
+metros e os votos variam um pouco, com um sorteio por restaurante. As cópias são
+gravadas uma a uma, sem montar o dataset inteiro na memória.
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from toeat.data import DATASET_PATH
+
+DATA_DIR = os.path.join( 'benchmarks', 'data' )
+
+# Versão do gerador, no nome do arquivo: CSVs gravados por uma versão anterior não são reaproveitados
+SYNTHETIC_VERSION = 2
+
+def synthetic_path(scale, data_dir=DATA_DIR):
+    return os.path.join( data_dir, f'zomato_x{scale}-v{SYNTHETIC_VERSION}.csv' )
+
+def synthetic_copy(df0, copy, rng):
+    """
+    Esta função gera a cópia número copy do dataset bruto df0 (a cópia 0 é o próprio original)
+    """
+    if copy == 0:
+        return df0
+    df = df0.copy()
+    # Mesmo sorteio para todas as linhas de um restaurante: duplicatas continuam idênticas
+    codes, ids = pd.factorize( df0['Restaurant ID'] )
+    n_ids = len( ids )
+    # Ids densos: a cópia copy ocupa o bloco de n_ids ids logo depois da cópia anterior
+    df['Restaurant ID'] = int( df0['Restaurant ID'].max() ) + 1 + (copy - 1) * n_ids + codes
+    df['Latitude'] = (df0['Latitude'] + rng.normal( 0, 0.01, n_ids )[codes]).clip( -90, 90 )
+    df['Longitude'] = (df0['Longitude'] + rng.normal( 0, 0.01, n_ids )[codes]).clip( -180, 180 )
+    df['Votes'] = (df0['Votes'] * rng.uniform( 0.8, 1.2, n_ids )[codes]).round().astype( df0['Votes'].dtype )
+    return df
+
+def write_synthetic(scale, output=None, source=DATASET_PATH, seed=0):
+    """
+    Esta função grava o CSV sintético de escala scale e retorna o caminho; um arquivo já existente é reaproveitado
+    """
+    if output is None:
+        output = synthetic_path( scale )
+    if os.path.exists( output ):
+        return output
+    os.makedirs( os.path.dirname( output ) or '.', exist_ok=True )
+    df0 = pd.read_csv( source )
+    rng = np.random.default_rng( seed )
+    tmp = output + '.tmp'
+    for copy in range( scale ):
+        synthetic_copy( df0, copy, rng ).to_csv( tmp, mode='w' if copy == 0 else 'a', header=copy == 0, index=False )
+    os.replace( tmp, output )
+    return output
+
+def main(argv=None):
+    parser = argparse.ArgumentParser( description='Gera um CSV sintético no formato do Zomato.' )
+    parser.add_argument( '--scale', type=int, required=True, help='quantas vezes o dataset original' )
+    parser.add_argument( '--output', help='CSV de saída (padrão: benchmarks/data/zomato_x<scale>-v<versão>.csv)' )
+    parser.add_argument( '--csv', default=DATASET_PATH, help='CSV de origem (padrão: %(default)s)' )
+    parser.add_argument( '--seed', type=int, default=0 )
+    args = parser.parse_args( argv )
+    print( write_synthetic( args.scale, args.output, args.csv, args.seed ) )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,3 @@
+"""
+ToEat Restaurants: funções compartilhadas pelas páginas do dashboard.
+"""
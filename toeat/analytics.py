@@ -0,0 +1,265 @@
+"""
+API de análise do dashboard, sem Streamlit.
+
+Cada métrica e cada conjunto de dados dos gráficos é uma função que recebe os
+filtros (países, culinárias, quantidade do top) e devolve um DataFrame ou um
+dicionário. As páginas só desenham o resultado; jobs em lote e benchmarks podem
+chamar as mesmas funções direto, por exemplo:
+
+    from toeat import analytics
+    analytics.restaurants_per_country( countries=['Brazil', 'India'] )
+    analytics.top_restaurants( 10, cuisines=['Italian'] )
+    analytics.restaurants_near( -22.97, -43.18, km=5 )
+
+Filtros None significam todos os valores. As estruturas usadas por baixo (cubo,
+índices, rankings e índice espacial) são calculadas uma vez por versão do dataset em path.
+
+As consultas da Visão Culinárias aceitam cuisine_mode: 'first' conta cada
+restaurante só na primeira culinária listada (como na limpeza) e 'all' em todas
+as culinárias da lista (ver CuisineListRankings em toeat/ranking.py).
+"""
+import os
+
+import numpy as np
+
+from toeat import cube
+from toeat.cache import LRUCache
+from toeat.data import DATASET_PATH, load_dataset, load_derived
+from toeat.fx import FX_PATH, load_fx_table
+from toeat.index import FilteredView, RowFilter, load_indexes
+from toeat.profiling import timed
+from toeat.ranking import (CITY_RANKINGS, MAX_FILTER_STATES, MAX_K, filter_key, load_city_rankings, load_cuisine_list_rankings,
+                           load_cuisine_rankings, load_restaurant_rankings)
+from toeat.spatial import load_spatial_index
+
+# ==================================================================
+# Filtros
+# ==================================================================
+@timed()
+def country_options(path=DATASET_PATH):
+    """
+    Esta função retorna os países do dataset, na ordem em que aparecem
+    """
+    return list( load_dataset( path )['country'].unique() )
+
+@timed()
+def select_rows(countries=None, cuisines=None, path=DATASET_PATH, row_filter=None):
+    """
+    Esta função retorna as linhas dos países e culinárias escolhidos (FilteredView de toeat/index.py).
+
+    row_filter permite reaproveitar a seleção anterior (ex.: o RowFilter da sessão do Streamlit). Só os filtros desta
+    chamada valem: uma seleção de culinárias feita antes no mesmo RowFilter não restringe uma chamada só com países.
+    """
+    if row_filter is None:
+        row_filter = RowFilter( load_dataset( path ), load_indexes( path ) )
+    filters = [(column, values) for column, values in [('country', countries), ('cuisines', cuisines)] if values is not None]
+    for column, values in filters:
+        row_filter.select( column, values )
+    return row_filter.view( [column for column, _ in filters] )
+
+# Culinárias contadas por restaurante na Visão Culinárias; muda com TOEAT_CUISINE_MODE
+CUISINE_MODES = ['first', 'all']
+CUISINE_MODE = os.environ.get( 'TOEAT_CUISINE_MODE', 'first' )
+
+def _cuisine_lists(cuisine_mode, path):
+    """
+    Esta função retorna os rankings com todas as culinárias no modo 'all' e None no modo 'first'
+    """
+    if cuisine_mode not in CUISINE_MODES:
+        raise ValueError( f'cuisine_mode deve ser um de {CUISINE_MODES}, não {cuisine_mode!r}' )
+    if cuisine_mode == 'all':
+        return load_cuisine_list_rankings( path )
+    return None
+
+@timed()
+def cuisine_options(countries=None, path=DATASET_PATH, row_filter=None, cuisine_mode=CUISINE_MODE):
+    """
+    Esta função retorna as culinárias com restaurantes nos países escolhidos
+    """
+    lists = _cuisine_lists( cuisine_mode, path )
+    if lists is not None:
+        return lists.options( countries )
+    if row_filter is None:
+        row_filter = RowFilter( load_dataset( path ), load_indexes( path ) )
+    if countries is None:
+        return list( row_filter.df1['cuisines'].unique() )
+    row_filter.select( 'country', countries )
+    return list( row_filter.view( ['country'] )['cuisines'].unique() )
+
+# ==================================================================
+# Visão Geral
+# ==================================================================
+@timed()
+def general_metrics(countries=None, path=DATASET_PATH, row_filter=None):
+    """
+    Esta função calcula as métricas gerais da Main Page: países, restaurantes, cidades, avaliações e culinárias
+    """
+    df1 = select_rows( countries, path=path, row_filter=row_filter )
+    return {
+        'countries': df1['country'].nunique(),
+        'restaurants': df1['restaurant_id'].nunique(),
+        'cities': df1['city'].nunique(),
+        'votes': df1['votes'].sum(),
+        'cuisines': len( df1['cuisines'].unique() ),
+        }
+
+# ==================================================================
+# Visão Países
+# ==================================================================
+def _discard_rollups(rollups, df1, delta):
+    """
+    Esta função descarta, depois de um delta, só os rollups de seleções que incluem um país afetado (ou todos os países)
+    """
+    def affected(key):
+        # key = (nome do rollup,) + filter_key( {'country': países} )
+        countries = dict( key[1:] )['country']
+        return countries is None or not delta.countries.isdisjoint( countries )
+    rollups.discard_if( affected )
+    return rollups
+
+def _country_rollup(rollup, countries, path, fx_table=None):
+    """
+    Esta função aplica rollup ao cubo filtrado, guardando o resultado por estado do filtro (um cache por versão do dataset).
+
+    Com fx_table, rollup também recebe a tabela de câmbio, e a versão da tabela entra na chave.
+    """
+    rollups = load_derived( 'country_rollups', lambda df1: LRUCache( MAX_FILTER_STATES, sizeof=lambda value: 1 ), path,
+                            update=_discard_rollups )
+    key = (rollup.__name__,) + filter_key( {'country': countries} )
+    arguments = ()
+    if fx_table is not None:
+        key += (('fx_version', fx_table.version),)
+        arguments = (fx_table,)
+    return rollups.get_or_create( key, lambda: rollup( cube.filter_cube( cube.load_cube( path ), countries=countries ), *arguments ) )
+
+@timed()
+def restaurants_per_country(countries=None, path=DATASET_PATH):
+    return _country_rollup( cube.restaurants_per_country, countries, path )
+
+@timed()
+def cities_per_country(countries=None, path=DATASET_PATH):
+    return _country_rollup( cube.cities_per_country, countries, path )
+
+@timed()
+def votes_per_country(countries=None, path=DATASET_PATH):
+    return _country_rollup( cube.votes_per_country, countries, path )
+
+@timed()
+def cost_per_country_and_currency(countries=None, path=DATASET_PATH):
+    return _country_rollup( cube.cost_per_country_and_currency, countries, path )
+
+@timed()
+def cost_per_country(countries=None, path=DATASET_PATH, fx_path=FX_PATH):
+    """
+    Esta função retorna o preço médio para dois de cada país convertido para a moeda de referência da tabela de câmbio
+    """
+    return _country_rollup( cube.cost_per_country, countries, path, load_fx_table( fx_path ) )
+
+def fx_version(fx_path=FX_PATH):
+    """
+    Esta função retorna a versão da tabela de câmbio (entra na chave dos caches de figuras e da API)
+    """
+    return load_fx_table( fx_path ).version
+
+# ==================================================================
+# Visão Cidades
+# ==================================================================
+@timed()
+def top_cities(ranking, k, countries=None, path=DATASET_PATH):
+    """
+    Esta função retorna as k cidades com maior valor de ranking (uma de CITY_RANKINGS) nos países escolhidos (k até MAX_K)
+    """
+    if ranking not in CITY_RANKINGS:
+        raise ValueError( f'ranking deve ser um de {CITY_RANKINGS}, não {ranking!r}' )
+    return load_city_rankings( path )[ranking].top( k, country=countries )
+
+# ==================================================================
+# Visão Culinárias
+# ==================================================================
+@timed()
+def top_restaurants(k, countries=None, cuisines=None, path=DATASET_PATH, cuisine_mode=CUISINE_MODE):
+    """
+    Esta função retorna os k restaurantes mais bem avaliados (empates pelo menor restaurant_id); k até MAX_K nos dois modos
+    """
+    if k > MAX_K:
+        raise ValueError( f'k deve ser no máximo {MAX_K}, não {k}' )
+    lists = _cuisine_lists( cuisine_mode, path )
+    if lists is not None:
+        return lists.top( k, country=countries, cuisines=cuisines )
+    return load_restaurant_rankings( path ).top( k, country=countries, cuisines=cuisines )
+
+@timed()
+def best_restaurant_per_cuisine(countries=None, cuisines=None, path=DATASET_PATH, cuisine_mode=CUISINE_MODE):
+    """
+    Esta função retorna o restaurante mais bem avaliado de cada culinária, indexado por cuisines
+    """
+    lists = _cuisine_lists( cuisine_mode, path )
+    if lists is not None:
+        return lists.first_per( country=countries, cuisines=cuisines )
+    return load_restaurant_rankings( path ).first_per( 'cuisines', country=countries, cuisines=cuisines )
+
+def _cuisine_top(ranking, k, countries, cuisines, path, cuisine_mode):
+    lists = _cuisine_lists( cuisine_mode, path )
+    if lists is not None:
+        return lists.cuisine_top( ranking, k, country=countries, cuisines=cuisines )
+    return load_cuisine_rankings( path )[ranking].top( k, country=countries, cuisines=cuisines )
+
+@timed()
+def best_cuisines(k, countries=None, cuisines=None, path=DATASET_PATH, cuisine_mode=CUISINE_MODE):
+    """
+    Esta função retorna as k culinárias com maior nota média
+    """
+    return _cuisine_top( 'best', k, countries, cuisines, path, cuisine_mode )
+
+@timed()
+def worst_cuisines(k, countries=None, cuisines=None, path=DATASET_PATH, cuisine_mode=CUISINE_MODE):
+    """
+    Esta função retorna as k culinárias com menor nota média
+    """
+    return _cuisine_top( 'worst', k, countries, cuisines, path, cuisine_mode )
+
+# ==================================================================
+# Visão Mapa
+# ==================================================================
+NEARBY_COLUMNS = ['restaurant_id', 'restaurant_name', 'country', 'city', 'cuisines', 'aggregate_rating', 'latitude', 'longitude']
+
+def _allowed_rows(countries, path, row_filter):
+    """
+    Esta função retorna a máscara por posição das linhas dos países escolhidos, ou None para todos
+    """
+    if countries is None:
+        return None
+    view = select_rows( countries, path=path, row_filter=row_filter )
+    allowed = np.zeros( len( view.df1 ), dtype=bool )
+    allowed[view.positions] = True
+    return allowed
+
+def _with_distances(df1, positions, distances):
+    df_aux = df1.loc[:, NEARBY_COLUMNS].take( positions ).reset_index( drop=True )
+    df_aux['distance_km'] = distances.round( 3 )
+    return df_aux
+
+@timed()
+def restaurants_in_bbox(south, west, north, east, countries=None, path=DATASET_PATH, row_filter=None):
+    """
+    Esta função retorna as linhas (FilteredView) dos países escolhidos dentro da janela; west > east cruza o antimeridiano
+    """
+    df1 = load_dataset( path ) if row_filter is None else row_filter.df1
+    allowed = _allowed_rows( countries, path, row_filter )
+    return FilteredView( df1, load_spatial_index( path ).bbox( south, west, north, east, allowed ) )
+
+@timed()
+def restaurants_near(latitude, longitude, km, countries=None, path=DATASET_PATH):
+    """
+    Esta função retorna os restaurantes a até km do ponto, do mais próximo ao mais distante (coluna distance_km)
+    """
+    positions, distances = load_spatial_index( path ).radius( latitude, longitude, km, _allowed_rows( countries, path, None ) )
+    return _with_distances( load_dataset( path ), positions, distances )
+
+@timed()
+def nearest_restaurants(latitude, longitude, k, countries=None, path=DATASET_PATH):
+    """
+    Esta função retorna os k restaurantes mais próximos do ponto (coluna distance_km)
+    """
+    positions, distances = load_spatial_index( path ).nearest( latitude, longitude, k, _allowed_rows( countries, path, None ) )
+    return _with_distances( load_dataset( path ), positions, distances )
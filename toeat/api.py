@@ -0,0 +1,269 @@
+"""
+API HTTP (JSON, só leitura) com os mesmos números do dashboard.
+
+    python -m toeat.api [--port 8600] [--csv dataset/zomato.csv]
+
+Rotas (todas GET; filtros opcionais country e cuisine, repetidos ou separados por vírgula):
+
+    /api/version                         versão do dataset
+    /api/metrics?country=...             métricas gerais da Main Page
+    /api/countries/<visão>?country=...   restaurants, cities, votes, cost ou normalized_cost
+    /api/cities/<ranking>?k=10&country=...                               k até ranking.MAX_K
+    /api/restaurants/top?k=10&country=...&cuisine=...&cuisine_mode=all   k até ranking.MAX_K
+    /api/cuisines/<best|worst>?k=10&country=...&cuisine=...&cuisine_mode=all
+    /api/restaurants/near?lat=...&lon=...&km=5&k=10&country=...
+    /api/restaurants/nearest?lat=...&lon=...&k=10&country=...
+    /api/restaurants/bbox?south=...&west=...&north=...&east=...&k=10&country=...
+
+Os dados vêm de toeat/analytics.py, sobre o mesmo dataset em cache do processo.
+cuisine_mode=all conta todas as culinárias listadas de cada restaurante
+(padrão: TOEAT_CUISINE_MODE, ver analytics.CUISINE_MODES).
+O ETag de cada resposta depende só da versão do dataset (com ?country=, a versão
+desses países; ver toeat/delta.py) e da consulta, então um GET condicional
+(If-None-Match) recebe 304 sem recalcular nada; normalized_cost (preço médio
+convertido pela tabela de câmbio, ver toeat/fx.py) também depende da versão da
+tabela. Os cálculos
+rodam num pool de threads para não travar o loop de eventos.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+
+import numpy as np
+import pandas as pd
+import tornado.ioloop
+import tornado.web
+
+from toeat import analytics
+from toeat.data import DATASET_PATH, dataset_version
+from toeat.ranking import CITY_RANKINGS, MAX_K
+from toeat.spatial import MAX_DISTANCE_KM
+
+DEFAULT_PORT = 8600
+
+# Limite do parâmetro k nas culinárias e nas consultas por local; os rankings de cidades e restaurantes
+# só guardam o top MAX_K de cada grupo (ver GroupTopK em toeat/ranking.py) e vão até MAX_K
+MAX_API_K = 1000
+
+COUNTRY_VIEWS = {
+    'restaurants': analytics.restaurants_per_country,
+    'cities': analytics.cities_per_country,
+    'votes': analytics.votes_per_country,
+    'cost': analytics.cost_per_country_and_currency,
+    'normalized_cost': analytics.cost_per_country,
+    }
+
+# Visões que dependem da tabela de câmbio
+FX_VIEWS = ['normalized_cost']
+
+CUISINE_VIEWS = {
+    'best': analytics.best_cuisines,
+    'worst': analytics.worst_cuisines,
+    }
+
+SPATIAL_VIEWS = ['near', 'nearest', 'bbox']
+
+def json_records(df):
+    """
+    Esta função converte um DataFrame em lista de dicionários serializáveis em JSON.
+
+    Colunas float32 são arredondadas em 6 casas, dentro da precisão do float32 (4.9 em vez de 4.900000095367432).
+    """
+    df = df.reset_index( drop=True )
+    float32 = [col for col in df.columns if df[col].dtype == np.float32]
+    if float32:
+        df = df.astype( {col: 'float64' for col in float32} ).round( {col: 6 for col in float32} )
+    return df.to_dict( 'records' )
+
+def json_default(value):
+    if isinstance( value, np.generic ):
+        return value.item()
+    raise TypeError( f'{type( value ).__name__} não é serializável em JSON' )
+
+class ApiHandler(tornado.web.RequestHandler):
+    """
+    Base das rotas: lê os filtros, responde 304 quando o ETag confere e serializa o resultado
+    """
+    def initialize(self, path):
+        self.dataset_path = path
+
+    def list_argument(self, name):
+        """
+        Retorna os valores de um filtro (?name=a&name=b ou ?name=a,b), ou None se ele não foi passado
+        """
+        values = [value.strip() for arg in self.get_query_arguments( name ) for value in arg.split( ',' )]
+        values = [value for value in values if value]
+        return values or None
+
+    def k_argument(self, default=10, maximum=MAX_API_K):
+        try:
+            k = int( self.get_query_argument( 'k', default ) )
+        except ValueError:
+            raise tornado.web.HTTPError( 400, 'k deve ser inteiro' )
+        if not 0 <= k <= maximum:
+            raise tornado.web.HTTPError( 400, f'k deve estar entre 0 e {maximum}' )
+        return k
+
+    def float_argument(self, name, low, high, default=None):
+        """
+        Retorna o parâmetro name como float entre low e high (obrigatório quando não há default)
+        """
+        value = self.get_query_argument( name, default )
+        if value is None:
+            raise tornado.web.HTTPError( 400, f'o parâmetro {name} é obrigatório' )
+        try:
+            value = float( value )
+        except ValueError:
+            raise tornado.web.HTTPError( 400, f'{name} deve ser numérico' )
+        if not low <= value <= high:
+            raise tornado.web.HTTPError( 400, f'{name} deve estar entre {low} e {high}' )
+        return value
+
+    def cuisine_mode_argument(self):
+        mode = self.get_query_argument( 'cuisine_mode', analytics.CUISINE_MODE )
+        if mode not in analytics.CUISINE_MODES:
+            raise tornado.web.HTTPError( 400, f'cuisine_mode deve ser um de {analytics.CUISINE_MODES}' )
+        return mode
+
+    def version_etag(self, versions=()):
+        """
+        ETag da resposta: versão do dataset (mais as de versions, ex.: a da tabela de câmbio), a rota e os parâmetros em ordem canônica
+        """
+        arguments = sorted( (name, tuple( values )) for name, values in self.request.query_arguments.items() )
+        key = repr( (dataset_version( self.dataset_path, self.list_argument( 'country' ) ), versions, self.request.path, arguments) )
+        return '"%s"' % hashlib.sha1( key.encode() ).hexdigest()
+
+    def compute_etag(self):
+        # O ETag é definido em respond(), antes de calcular a resposta
+        return None
+
+    async def respond(self, compute, versions=()):
+        """
+        Esta função responde 304 se o cliente já tem a versão atual, ou calcula compute() numa thread
+        """
+        self.set_header( 'Etag', self.version_etag( versions ) )
+        self.set_header( 'Cache-Control', 'no-cache' )
+        if self.check_etag_header():
+            self.set_status( 304 )
+            return
+        result = await tornado.ioloop.IOLoop.current().run_in_executor( None, compute )
+        if isinstance( result, pd.DataFrame ):
+            result = json_records( result )
+        self.set_header( 'Content-Type', 'application/json; charset=UTF-8' )
+        self.finish( json.dumps( {'data': result}, default=json_default, ensure_ascii=False ) )
+
+    def write_error(self, status_code, **kwargs):
+        # A mensagem do HTTPError vai no corpo; a linha de status fica com a frase padrão
+        error = kwargs.get( 'exc_info', (None, None) )[1]
+        message = getattr( error, 'log_message', None ) or self._reason
+        self.set_header( 'Content-Type', 'application/json; charset=UTF-8' )
+        self.finish( json.dumps( {'error': message, 'status': status_code}, ensure_ascii=False ) )
+
+class VersionHandler(ApiHandler):
+    async def get(self):
+        version = dataset_version( self.dataset_path )
+        await self.respond( lambda: {'mtime_ns': version[0], 'size': version[1], 'deltas': version[2]} )
+
+class MetricsHandler(ApiHandler):
+    async def get(self):
+        countries = self.list_argument( 'country' )
+        await self.respond( lambda: analytics.general_metrics( countries, path=self.dataset_path ) )
+
+class CountriesHandler(ApiHandler):
+    async def get(self, view):
+        if view not in COUNTRY_VIEWS:
+            raise tornado.web.HTTPError( 404, f'visão deve ser uma de {list( COUNTRY_VIEWS )}' )
+        countries = self.list_argument( 'country' )
+        versions = (('fx', analytics.fx_version()),) if view in FX_VIEWS else ()
+        await self.respond( lambda: COUNTRY_VIEWS[view]( countries, path=self.dataset_path ), versions )
+
+class CitiesHandler(ApiHandler):
+    async def get(self, ranking):
+        if ranking not in CITY_RANKINGS:
+            raise tornado.web.HTTPError( 404, f'ranking deve ser um de {CITY_RANKINGS}' )
+        k = self.k_argument( maximum=MAX_K )
+        countries = self.list_argument( 'country' )
+        await self.respond( lambda: analytics.top_cities( ranking, k, countries, path=self.dataset_path ) )
+
+class TopRestaurantsHandler(ApiHandler):
+    async def get(self):
+        k = self.k_argument( maximum=MAX_K )
+        countries = self.list_argument( 'country' )
+        cuisines = self.list_argument( 'cuisine' )
+        mode = self.cuisine_mode_argument()
+        await self.respond( lambda: analytics.top_restaurants( k, countries, cuisines, path=self.dataset_path, cuisine_mode=mode ) )
+
+class CuisinesHandler(ApiHandler):
+    async def get(self, view):
+        if view not in CUISINE_VIEWS:
+            raise tornado.web.HTTPError( 404, f'visão deve ser uma de {list( CUISINE_VIEWS )}' )
+        k = self.k_argument()
+        countries = self.list_argument( 'country' )
+        cuisines = self.list_argument( 'cuisine' )
+        mode = self.cuisine_mode_argument()
+        await self.respond( lambda: CUISINE_VIEWS[view]( k, countries, cuisines, path=self.dataset_path, cuisine_mode=mode ) )
+
+class SpatialHandler(ApiHandler):
+    async def get(self, view):
+        if view not in SPATIAL_VIEWS:
+            raise tornado.web.HTTPError( 404, f'visão deve ser uma de {SPATIAL_VIEWS}' )
+        k = self.k_argument()
+        countries = self.list_argument( 'country' )
+        if view == 'bbox':
+            bounds = [self.float_argument( 'south', -90, 90 ), self.float_argument( 'west', -180, 180 ),
+                      self.float_argument( 'north', -90, 90 ), self.float_argument( 'east', -180, 180 )]
+            compute = lambda: analytics.restaurants_in_bbox( *bounds, countries, path=self.dataset_path ).frame( analytics.NEARBY_COLUMNS ).head( k )
+        else:
+            latitude = self.float_argument( 'lat', -90, 90 )
+            longitude = self.float_argument( 'lon', -180, 180 )
+            if view == 'near':
+                km = self.float_argument( 'km', 0, MAX_DISTANCE_KM, default='5' )
+                compute = lambda: analytics.restaurants_near( latitude, longitude, km, countries, path=self.dataset_path ).head( k )
+            else:
+                compute = lambda: analytics.nearest_restaurants( latitude, longitude, k, countries, path=self.dataset_path )
+        await self.respond( compute )
+
+def make_app(path=DATASET_PATH):
+    """
+    Esta função cria a aplicação tornado com as rotas da API sobre o dataset em path
+    """
+    options = dict( path=path )
+    return tornado.web.Application([
+        (r'/api/version', VersionHandler, options),
+        (r'/api/metrics', MetricsHandler, options),
+        (r'/api/countries/(\w+)', CountriesHandler, options),
+        (r'/api/cities/(\w+)', CitiesHandler, options),
+        (r'/api/restaurants/top', TopRestaurantsHandler, options),
+        (r'/api/restaurants/(\w+)', SpatialHandler, options),
+        (r'/api/cuisines/(\w+)', CuisinesHandler, options),
+        ])
+
+def warm_up(path=DATASET_PATH):
+    """
+    Carrega o dataset e as estruturas derivadas antes de aceitar conexões
+    """
+    analytics.general_metrics( path=path )
+    analytics.restaurants_per_country( path=path )
+    analytics.top_cities( CITY_RANKINGS[0], 1, path=path )
+    analytics.top_restaurants( 1, path=path )
+    analytics.best_cuisines( 1, path=path )
+    analytics.nearest_restaurants( 0, 0, 1, path=path )
+
+async def serve(app, port=DEFAULT_PORT, address='127.0.0.1'):
+    app.listen( port, address=address )
+    print( f'API em http://{address}:{port}/api/metrics', flush=True )
+    await asyncio.Event().wait()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser( description='Serve os agregados do dashboard em JSON.' )
+    parser.add_argument( '--port', type=int, default=DEFAULT_PORT, help='porta HTTP (padrão: %(default)s)' )
+    parser.add_argument( '--address', default='127.0.0.1', help='endereço de escuta (padrão: %(default)s)' )
+    parser.add_argument( '--csv', default=DATASET_PATH, help='CSV de origem (padrão: %(default)s)' )
+    args = parser.parse_args( argv )
+
+    warm_up( args.csv )
+    asyncio.run( serve( make_app( args.csv ), args.port, args.address ) )
+
+if __name__ == '__main__':
+    main()
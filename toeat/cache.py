@@ -0,0 +1,70 @@
+"""
+Cache LRU em memória, compartilhado pelas sessões do processo e limitado pelo tamanho dos valores.
+"""
+from collections import OrderedDict
+import threading
+
+class LRUCache:
+    """
+    Cache LRU limitado pela soma dos tamanhos dos valores (sizeof, por padrão len).
+
+    Quando um novo valor estoura max_size, os itens usados há mais tempo são descartados.
+    Valores maiores que max_size não são guardados.
+    """
+    def __init__(self, max_size, sizeof=len):
+        self.max_size = max_size
+        self.sizeof = sizeof
+        self.size = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len( self._items )
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._items:
+                return default
+            self._items.move_to_end( key )
+            return self._items[key][0]
+
+    def put(self, key, value):
+        size = self.sizeof( value )
+        with self._lock:
+            if key in self._items:
+                self.size -= self._items.pop( key )[1]
+            if size > self.max_size:
+                return value
+            self._items[key] = (value, size)
+            self.size += size
+            while self.size > self.max_size:
+                _, (_, evicted_size) = self._items.popitem( last=False )
+                self.size -= evicted_size
+        return value
+
+    def get_or_create(self, key, factory):
+        """
+        Retorna o valor em cache ou cria com factory(); a criação roda fora do lock
+        """
+        value = self.get( key )
+        if value is None:
+            value = self.put( key, factory() )
+        return value
+
+    def discard_if(self, predicate):
+        """
+        Remove os itens cuja chave satisfaz predicate(key); retorna quantos foram removidos
+        """
+        with self._lock:
+            keys = [key for key in self._items if predicate( key )]
+            for key in keys:
+                self.size -= self._items.pop( key )[1]
+        return len( keys )
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.size = 0
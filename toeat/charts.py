@@ -0,0 +1,88 @@
+"""
+Gráficos de barras das páginas e cache das figuras.
+
+Montar uma figura com plotly.express leva dezenas de milissegundos, mesmo com
+poucas barras. cached_figure guarda o JSON de cada figura num cache LRU, com a
+chave (id do gráfico, estado dos filtros e do slider, versão do dataset): num
+rerun em que nada disso mudou, a figura é refeita a partir do JSON, sem
+recalcular os dados nem validar a figura de novo. A versão é a dos países do
+filtro: um delta em outro país (ver toeat/delta.py) não invalida a figura.
+
+O plotly.express só é importado quando uma figura é montada: abrir uma página
+com todas as figuras em cache não paga o import (ver benchmarks/bench_imports.py).
+"""
+import json
+
+from toeat.cache import LRUCache
+from toeat.data import DATASET_PATH, dataset_version
+from toeat.profiling import stage, timed
+
+# Sequência de cores dos gráficos com legenda
+COLOR_SEQUENCE = ['mediumpurple', 'indianred', 'mediumseagreen', 'lightskyblue', 'pink', 'oldlace', 'greenyellow', 'orange', 'darksalmon', 'mediumaquamarine', 'lavenderblush', 'powderblue', 'khaki', 'deeppink', 'royalblue']
+
+@timed()
+def bar_graph_without_color_sequence(eixo_x, eixo_y, label_x, label_y, df_aux, title, title_size):
+    """
+    Esta função tem o objetivo de gerar um gráfico de barras sem legenda e sem diferenciação nas cores
+    """
+    # Import local: ver o início do módulo
+    import plotly.express as px
+
+    fig = px.bar(df_aux,
+                 x=eixo_x,
+                 y=eixo_y,
+                 labels={eixo_x:label_x, eixo_y:label_y})
+    fig.update_layout(title_text=title, title_font_size=title_size, plot_bgcolor='rgba(0,0,0,0)')
+    fig.update_traces(marker=dict(color='indianred'))
+    fig.update_yaxes( mirror=True, ticks='outside', showline=False, linecolor='black',gridcolor='darkgray')
+    return fig
+
+@timed()
+def bar_graph_with_colors(eixo_x, eixo_y, legenda, label_x, label_y, label_legenda, df_aux, title, title_size):
+    """
+    Esta função gera um gráfico de barras com as cores de COLOR_SEQUENCE para cada valor da legenda
+    """
+    # Import local: ver o início do módulo
+    import plotly.express as px
+
+    fig = px.bar(df_aux,
+                 x= eixo_x,
+                 y=eixo_y,
+                 color=legenda,
+                 labels={eixo_x: label_x, eixo_y: label_y, legenda: label_legenda},
+                 color_discrete_sequence=COLOR_SEQUENCE
+                )
+    fig.update_layout(title_text=title, title_font_size= title_size, plot_bgcolor='rgba(0,0,0,0)')
+    fig.update_yaxes( mirror=True, ticks='outside', showline=False, linecolor='black',gridcolor='darkgray')
+    return fig
+
+# ==================================================================
+# Cache das figuras
+# ==================================================================
+# Limite do cache, em caracteres de JSON (cada figura das páginas tem ~10 KB)
+FIGURE_CACHE_SIZE = 64 * 2**20
+
+FIGURE_CACHE = LRUCache( FIGURE_CACHE_SIZE )
+
+def figure_key(**state):
+    """
+    Esta função monta a chave do estado de um gráfico (filtros e slider); a ordem dos itens de um filtro não importa
+    """
+    return tuple( sorted( (name, tuple( sorted( value ) ) if isinstance( value, (list, tuple, set, frozenset) ) else value)
+                          for name, value in state.items() ) )
+
+@timed()
+def cached_figure(chart_id, state, build, path=DATASET_PATH):
+    """
+    Esta função retorna a figura do gráfico chart_id para o estado state (ver figure_key).
+
+    build() monta a figura (dados e plotly) e só é chamada quando o JSON não está em cache.
+    """
+    # Import local: ver o início do módulo
+    import plotly.graph_objects as go
+
+    key = (chart_id, state, dataset_version( path, dict( state ).get( 'country' ) ))
+    figure_json = FIGURE_CACHE.get_or_create( key, lambda: build().to_json() )
+    with stage( 'figure_from_json' ):
+        # O JSON veio de uma figura já validada pelo plotly
+        return go.Figure( json.loads( figure_json ), _validate=False )
@@ -0,0 +1,146 @@
+"""
+Cubo de agregados por (country, city, cuisines, currency) usado pelos gráficos.
+
+O cubo é calculado uma vez por versão do dataset. Cada gráfico das páginas de
+países, cidades e culinárias é obtido consolidando (rollup) as linhas do cubo
+dos filtros selecionados, com custo proporcional ao número de grupos e não ao
+número de restaurantes.
+"""
+import numpy as np
+import pandas as pd
+
+from toeat.data import DATASET_PATH, load_derived
+
+CUBE_KEYS = ['country', 'city', 'cuisines', 'currency']
+
+def build_cube(df1):
+    """
+    Esta função agrega df1 por CUBE_KEYS: quantidade de restaurantes, somas de nota, votos e preço, restaurantes com
+    preço informado (maior que 0) e faixas de nota
+    """
+    df_aux = df1.loc[:, CUBE_KEYS].copy()
+    df_aux['restaurants'] = 1
+    # Somas em float64/int64 para não acumular erro dos tipos compactos
+    # (as notas têm uma casa decimal; o round desfaz o ruído do float32)
+    df_aux['rating_sum'] = df1['aggregate_rating'].astype('float64').round(1)
+    df_aux['votes_sum'] = df1['votes'].astype('int64')
+    df_aux['cost_sum'] = df1['average_cost_for_two'].astype('int64')
+    df_aux['cost_count'] = (df1['average_cost_for_two'] > 0).astype('int64')
+    df_aux['rating_above_4'] = (df1['aggregate_rating'] > 4).astype('int64')
+    df_aux['rating_below_2_5'] = (df1['aggregate_rating'] < 2.5).astype('int64')
+    return df_aux.groupby(CUBE_KEYS, observed=True).sum().reset_index()
+
+def merge_cubes(cubes):
+    """
+    Esta função junta cubos parciais (ex.: de blocos do CSV sem linhas em comum); todas as métricas do cubo são somas
+    """
+    return pd.concat( cubes, ignore_index=True ).groupby(CUBE_KEYS, observed=True).sum().reset_index()
+
+def group_mask(df, groups):
+    """
+    Esta função retorna a máscara (array) das linhas de df cujas chaves, nas colunas de groups, são uma das linhas de groups
+    """
+    keys = list( groups.columns )
+    # Pré-filtro pela primeira chave (o país), que descarta a maior parte das linhas sem montar tuplas
+    mask = df[keys[0]].isin( groups[keys[0]].unique() ).to_numpy()
+    if mask.any() and len( keys ) > 1:
+        candidates = pd.MultiIndex.from_frame( df.loc[mask, keys].astype( object ) )
+        mask[mask] = candidates.isin( pd.MultiIndex.from_frame( groups.astype( object ) ) )
+    return mask
+
+def concat_like(frames, like):
+    """
+    Esta função concatena frames e devolve as colunas categóricas com os tipos de like (categorias diferentes viram object no concat)
+    """
+    merged = pd.concat( frames )
+    dtypes = {col: like[col].dtype for col in merged.columns if col in like.columns and isinstance( like[col].dtype, pd.CategoricalDtype )}
+    return merged.astype( dtypes )
+
+def update_cube(cube, df1, delta):
+    """
+    Esta função atualiza o cubo depois de um delta (ver toeat/delta.py): só os grupos afetados são recalculados a partir de df1
+    """
+    groups = delta.groups( CUBE_KEYS )
+    kept = cube.loc[~group_mask( cube, groups ), :]
+    fresh = build_cube( df1.loc[group_mask( df1, groups ), :] )
+    return concat_like( [kept, fresh], df1 ).sort_values( CUBE_KEYS ).reset_index( drop=True )
+
+def load_cube(path=DATASET_PATH):
+    """
+    Esta função retorna o cubo do dataset em cache
+    """
+    return load_derived( 'cube', build_cube, path, update=update_cube )
+
+def filter_cube(cube, countries=None, cuisines=None):
+    """
+    Esta função seleciona as linhas do cubo dos países e culinárias escolhidos (None = todos)
+    """
+    linhas_selec = pd.Series(True, index=cube.index)
+    if countries is not None:
+        linhas_selec &= cube['country'].isin(countries)
+    if cuisines is not None:
+        linhas_selec &= cube['cuisines'].isin(cuisines)
+    return cube.loc[linhas_selec, :]
+
+# ==================================================================
+# Visão Países
+# ==================================================================
+def restaurants_per_country(cube):
+    return cube.loc[:, ['country', 'restaurants']].groupby('country', observed=True).sum().sort_values( by='restaurants', ascending=False ).reset_index()
+
+def cities_per_country(cube):
+    return cube.loc[:, ['country', 'city']].groupby('country', observed=True).nunique().sort_values(by='city', ascending=False).reset_index()
+
+def votes_per_country(cube):
+    df_aux = cube.loc[:, ['country', 'votes_sum', 'restaurants']].groupby('country', observed=True).sum()
+    df_aux['votes'] = df_aux['votes_sum'] / df_aux['restaurants']
+    return df_aux.loc[:, ['votes']].reset_index()
+
+def cost_per_country_and_currency(cube):
+    df_aux = cube.loc[:, ['country', 'currency', 'cost_sum', 'restaurants']].groupby(['country', 'currency'], observed=True).sum()
+    df_aux['average_cost_for_two'] = round(df_aux['cost_sum'] / df_aux['restaurants'], 2)
+    return df_aux.loc[:, ['average_cost_for_two']].reset_index()
+
+def cost_per_country(cube, fx_table):
+    """
+    Esta função calcula o preço médio para dois de cada país na moeda de referência de fx_table (ver toeat/fx.py).
+
+    As somas do cubo são convertidas por (country, currency) antes de somar por país; só entram na média os
+    restaurantes com preço informado e com taxa na tabela.
+    """
+    rates = fx_table.rates( cube['country'], cube['currency'] )
+    converted = ~np.isnan( rates )
+    df_aux = cube.loc[:, ['country']].assign(
+        cost_sum=np.where( converted, cube['cost_sum'].to_numpy() * rates, 0.0 ),
+        cost_count=np.where( converted, cube['cost_count'].to_numpy(), 0 ),
+        )
+    df_aux = df_aux.groupby('country', observed=True).sum()
+    df_aux = df_aux.loc[df_aux['cost_count'] > 0, :]
+    df_aux['average_cost_for_two'] = round(df_aux['cost_sum'] / df_aux['cost_count'], 2)
+    df_aux['currency'] = fx_table.reference
+    return df_aux.loc[:, ['average_cost_for_two', 'currency']].sort_values(by='average_cost_for_two', ascending=False).reset_index()
+
+# ==================================================================
+# Visão Cidades
+# ==================================================================
+def city_table(cube):
+    """
+    Esta função consolida o cubo por cidade: restaurantes, faixas de nota e quantidade de culinárias distintas
+    """
+    return cube.groupby(['city', 'country'], observed=True).agg(
+        restaurants=('restaurants', 'sum'),
+        rating_above_4=('rating_above_4', 'sum'),
+        rating_below_2_5=('rating_below_2_5', 'sum'),
+        cuisines=('cuisines', 'nunique'),
+        ).reset_index()
+
+# ==================================================================
+# Visão Culinárias
+# ==================================================================
+def rating_per_cuisine(cube):
+    """
+    Esta função calcula a nota média por culinária (a ordem fica por conta de toeat/ranking.py)
+    """
+    df_aux = cube.loc[:, ['cuisines', 'rating_sum', 'restaurants']].groupby('cuisines', observed=True).sum()
+    df_aux['aggregate_rating'] = df_aux['rating_sum'] / df_aux['restaurants']
+    return df_aux.loc[:, ['aggregate_rating']].reset_index()
@@ -0,0 +1,455 @@
+"""
+Leitura e limpeza do dataset Zomato, compartilhadas por todas as páginas.
+
+O pipeline (read_dataset_csv, enriquecimento e clean_code) roda uma
+única vez por processo. O resultado fica em cache, associado ao mtime e ao
+tamanho do arquivo, e só é recalculado quando o dataset muda de verdade.
+
+O dataset limpo também é gravado num snapshot colunar (ver toeat/snapshot.py),
+lido via memory map nos próximos cold starts e refeito quando o CSV é mais novo.
+CSVs grandes são convertidos em blocos, com memória limitada (ver toeat/ingest.py),
+e deltas diários atualizam o snapshot sem refazer o pipeline (ver toeat/delta.py).
+Na carga aplica-se o schema compacto de toeat/schema.py; por padrão só as colunas
+usadas pelas páginas (PAGE_COLUMNS) são carregadas.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from toeat.profiling import stage, timed
+from toeat.schema import PAGE_COLUMNS, apply_schema, read_dataset_csv
+
+DATASET_PATH = 'dataset/zomato.csv'
+
+# ==================================================================
+# Funções de limpeza
+# ==================================================================
+# As colunas já chegam com os nomes do pipeline: read_dataset_csv aplica CSV_COLUMNS (ver toeat/schema.py) na leitura
+
+# Função para converter código de país para nome de país
+COUNTRIES = {
+    1: 'India',
+    14: 'Australia',
+    30: 'Brazil',
+    37: 'Canada',
+    94: 'Indonesia',
+    148: 'New Zeland',
+    162: 'Philippines',
+    166: 'Qatar',
+    184: 'Singapure',
+    189: 'South Africa',
+    191: 'Sri Lanka',
+    208: 'Turkey',
+    214: 'United Arab Emirates',
+    215: 'England',
+    216:'United States of America'
+    }
+
+# Categoria em relação ao preço da comida; price_range fora da tabela vira "gourmet"
+PRICE_TYPES = {
+    1: "cheap",
+    2: "normal",
+    3: "expensive",
+    }
+
+# Função para transformar código de cor em nome de cor
+COLORS = {
+    "3F7E00": "darkgreen",
+    "5BA829": "green",
+    "9ACD32": "lightgreen",
+    "CDD614": "orange",
+    "FFBA00": "red",
+    "CBCBC8": "darkred",
+    "FF7800": "darkred",
+    }
+
+# Culinárias descartadas na limpeza (e ignoradas nas listas de all_cuisines)
+EXCLUDED_CUISINES = ['Drinks Only', 'Mineira']
+
+# Cerca de preço por país (ver cost_limits): Q3 + OUTLIER_IQR_FACTOR × IQR sobre o log10 dos preços positivos
+OUTLIER_IQR_FACTOR = 6
+# Menor razão Q3/Q1 usada na cerca: com quase todos os preços iguais o IQR vai a 0 e a cerca cairia no próprio Q3
+OUTLIER_MIN_SPREAD = 1.5
+
+# Valores usados quando o código não está nas tabelas acima, em vez de KeyError
+UNKNOWN_COUNTRY = 'Unknown'
+DEFAULT_PRICE_TYPE = 'gourmet'
+UNKNOWN_COLOR = 'gray'
+
+@timed()
+def enrich_columns( df1 ):
+    """
+    Esta função cria as colunas country, category_price e rating_color_name com lookups vetorizados
+    """
+    df1['country'] = df1['country_code'].map(COUNTRIES).fillna(UNKNOWN_COUNTRY)
+    df1['category_price'] = df1['price_range'].map(PRICE_TYPES).fillna(DEFAULT_PRICE_TYPE)
+    df1['rating_color_name'] = df1['rating_color'].map(COLORS).fillna(UNKNOWN_COLOR)
+    return df1
+
+# Regra da remoção de duplicadas por restaurant_id: 'latest' mantém a última linha do arquivo,
+# 'most_votes' a de mais votos (no empate, a última). Muda com TOEAT_DEDUP_RULE; a regra fica nos metadados do
+# snapshot, que é refeito quando ela muda (ver snapshot_is_stale)
+DEDUP_RULES = ['latest', 'most_votes']
+DEDUP_RULE = os.environ.get( 'TOEAT_DEDUP_RULE', 'latest' )
+
+def keep_positions( ids, votes=None, rule=DEDUP_RULE ):
+    """
+    Esta função retorna, em ordem crescente, as posições das linhas mantidas: uma por restaurant_id, escolhida por rule.
+
+    Só os ids (e os votos, na regra most_votes) são comparados, por uma tabela hash, nunca as linhas inteiras.
+    """
+    ids = pd.Series( np.asarray( ids ) )
+    if rule == 'latest':
+        return np.flatnonzero( ~ids.duplicated( keep='last' ).to_numpy() )
+    if rule == 'most_votes':
+        # Em ordem estável de votos, a última linha de cada id tem mais votos e, no empate, é a mais recente
+        order = np.argsort( np.asarray( votes ), kind='stable' )
+        last = ~ids.iloc[order].duplicated( keep='last' ).to_numpy()
+        return np.sort( order[last] )
+    raise ValueError( f'regra de duplicadas desconhecida: {rule!r} (use {DEDUP_RULES})' )
+
+@timed()
+def dedup_restaurants( df1, rule=DEDUP_RULE, report=None ):
+    """
+    Esta função mantém uma linha por restaurant_id (ver keep_positions); report, se dado, recebe linhas removidas e segundos
+    """
+    start = time.perf_counter()
+    rows_before = len( df1 )
+    positions = keep_positions( df1['restaurant_id'], df1['votes'], rule )
+    if len( positions ) < rows_before:
+        # take devolve um DataFrame novo: a limpeza pode alterar colunas sem SettingWithCopyWarning
+        df1 = df1.take( positions )
+    if report is not None:
+        report.update( {
+            'rule': rule,
+            'rows_before': rows_before,
+            'collapsed': rows_before - len( df1 ),
+            'seconds': round( time.perf_counter() - start, 6 ),
+            } )
+    return df1
+
+@timed()
+def clean_code( df1, dedup_rule=DEDUP_RULE, report=None ):
+    """
+    Esta função tem o objetivo de, junto às funções fornecidas no exercício, finalizar a limpeza do gráfico
+    """
+    # 1. Removendo linhas duplicadas: uma por restaurant_id (duplicadas exatas e versões com votos diferentes)
+    df1 = dedup_restaurants( df1, dedup_rule, report )
+
+    return clean_rows( df1 )
+
+def cost_limits( country_codes, costs ):
+    """
+    Esta função calcula, numa passada agrupada por country_code, o maior preço para dois aceito em cada país: a cerca
+    de Tukey Q3 + k × IQR sobre o log10 dos preços positivos (preço 0 = não informado), com k = OUTLIER_IQR_FACTOR.
+
+    O log põe as moedas na mesma escala (a cerca vale em múltiplos: Q3 vezes (Q3/Q1)^k) e o IQR acompanha a dispersão
+    de cada país. k = 6 porque, no export, o maior preço plausível fica a 4,4 IQRs do Q3 (3210 rands para dois na África
+    do Sul) e o erro de digitação 25000017 da Austrália a 19,8; o k = 3 usual descartaria preços reais de restaurantes
+    caros (250 libras na Inglaterra, 2800 e 3210 rands na África do Sul).
+    """
+    costs = pd.Series( np.asarray( costs, dtype='float64' ) )
+    grouped = np.log10( costs.where( costs > 0 ) ).groupby( np.asarray( country_codes ) )
+    q1 = grouped.quantile( 0.25 )
+    q3 = grouped.quantile( 0.75 )
+    spread = (q3 - q1).clip( lower=np.log10( OUTLIER_MIN_SPREAD ) )
+    return 10 ** (q3 + OUTLIER_IQR_FACTOR * spread)
+
+def clean_rows( df1, limits=None ):
+    """
+    Esta função aplica as etapas da limpeza que tratam cada linha isoladamente (todas menos a remoção de duplicadas).
+
+    limits são os limites de preço por país (ver cost_limits); por padrão saem de df1. Quem limpa o CSV por partes
+    (blocos, fatias por país, deltas) passa os limites calculados sobre o dataset inteiro, para o resultado não
+    depender do corte.
+    """
+    if limits is None:
+        limits = cost_limits( df1['country_code'], df1['average_cost_for_two'] )
+
+    # 2. Colunas inúteis, com só 1 valor (switch_to_order_menu), nem são lidas: ver CSV_COLUMNS
+
+    # 3. Pegando somente a primeira opção de Cuisines, usando estratégia do Pedro;
+    # a lista completa fica em all_cuisines para o modo que conta todas as culinárias (ver CuisineListRankings)
+    df1['all_cuisines'] = df1['cuisines']
+    df1['cuisines'] = df1['cuisines'].astype(str).str.split(',', n=1).str[0]
+
+    # 4. Convertendo tipo das colunas. Há cols com 0 e 1 então é bool e nao int
+    df1['has_table_booking'] = df1['has_table_booking'].astype(bool)
+    df1['has_online_delivery'] = df1['has_online_delivery'].astype(bool)
+    df1['is_delivering_now'] = df1['is_delivering_now'].astype(bool)
+
+    # 5. Retirando nan de df1['cuisines]
+    linhas_selecionadas = (df1['cuisines'] != 'nan') & ~df1['cuisines'].isin( EXCLUDED_CUISINES )
+    df1 = df1.loc[linhas_selecionadas, :].copy()
+
+    # 6. Retirando os outliers de average_cost_for_two: acima do limite do país (país sem limite: a linha fica)
+    limite = df1['country_code'].map( limits ).to_numpy( dtype='float64' )
+    linhas_selec_preco = ~(df1['average_cost_for_two'].to_numpy( dtype='float64' ) > limite)
+    df1 = df1.loc[linhas_selec_preco, :].copy()
+
+    return df1
+
+def build_dataset(path=DATASET_PATH, dedup_rule=DEDUP_RULE, report=None):
+    """
+    Esta função executa o pipeline completo: leitura do CSV (já com os nomes do schema), enriquecimento e limpeza
+    (report recebe o relatório das duplicadas, ver dedup_restaurants)
+    """
+    with stage( 'read_csv' ):
+        df1 = read_dataset_csv( path )
+
+    df1 = enrich_columns( df1 )
+
+    return clean_code( df1, dedup_rule, report )
+
+def build_snapshot(path=DATASET_PATH, output=None, dedup_rule=DEDUP_RULE, report=None):
+    """
+    Esta função roda o pipeline sobre o CSV e grava o snapshot colunar; retorna o caminho gravado
+    """
+    # Import local: toeat.snapshot (pyarrow.feather) só é preciso ao ler ou gravar o snapshot
+    from toeat.snapshot import snapshot_path, write_snapshot
+
+    if output is None:
+        output = snapshot_path( path )
+    return write_snapshot( build_dataset( path, dedup_rule, report ), output, dedup_rule )
+
+# CSVs maiores que isto viram snapshot pela ingestão em blocos (ver toeat/ingest.py)
+CHUNKED_INGEST_BYTES = 256 * 2**20
+
+# Processos usados para refazer o snapshot (ver toeat/parallel.py); 1 = no próprio processo
+DATASET_WORKERS = int( os.environ.get( 'TOEAT_WORKERS', '1' ) )
+
+def ensure_snapshot(path=DATASET_PATH, dedup_rule=DEDUP_RULE):
+    """
+    Esta função refaz o snapshot do CSV se ele estiver desatualizado ou foi gravado com outra regra de duplicadas, e
+    reaplica os deltas registrados que ainda não estão nele; retorna o seu caminho (OSError sem permissão de escrita)
+    """
+    # Import local: toeat.snapshot (pyarrow.feather) fica fora do import das páginas
+    from toeat.snapshot import snapshot_deltas, snapshot_is_stale, snapshot_path
+
+    snapshot = snapshot_path( path )
+    counter = delta_versions( path )['counter']
+    # Um snapshot com mais deltas do que os registrados (versions.json apagado ou de outro CSV) volta ao CSV
+    if snapshot_is_stale( snapshot, path, dedup_rule ) or (snapshot_deltas( snapshot ) or 0) > counter:
+        if os.path.getsize( path ) > CHUNKED_INGEST_BYTES:
+            # Import local: toeat.ingest importa este módulo
+            from toeat.ingest import ingest_csv
+            ingest_csv( path, snapshot, dedup_rule=dedup_rule )
+        elif DATASET_WORKERS > 1:
+            # Import local: toeat.parallel importa este módulo
+            from toeat.parallel import build_snapshot_parallel
+            build_snapshot_parallel( path, snapshot, DATASET_WORKERS, dedup_rule )
+        else:
+            build_snapshot( path, snapshot, dedup_rule )
+    replay_pending( path, snapshot )
+    return snapshot
+
+def replay_pending(path=DATASET_PATH, snapshot=None):
+    """
+    Esta função reaplica ao snapshot do CSV os deltas registrados que ainda não estão nele (ex.: logo depois de refeito);
+    retorna quantos foram reaplicados
+    """
+    # Import local: toeat.snapshot (pyarrow.feather) fica fora do import das páginas
+    from toeat.snapshot import snapshot_deltas, snapshot_path
+
+    if snapshot is None:
+        snapshot = snapshot_path( path )
+    applied = snapshot_deltas( snapshot )
+    pending = 0 if applied is None else delta_versions( path )['counter'] - applied
+    if pending > 0:
+        # Import local: toeat.delta importa este módulo
+        from toeat.delta import replay_snapshot
+        replay_snapshot( path, snapshot, applied )
+    return max( pending, 0 )
+
+@timed( 'read_dataset' )
+def _read_dataset(path, columns):
+    # Import local: toeat.snapshot (pyarrow.feather) fica fora do import das páginas
+    from toeat.snapshot import read_snapshot
+
+    try:
+        snapshot = ensure_snapshot( path )
+    except OSError:
+        # Sem permissão de escrita no diretório do dataset: segue direto do CSV, com os deltas registrados reaplicados em memória
+        df1 = build_dataset( path )
+        if delta_versions( path )['counter']:
+            # Import local: toeat.delta importa este módulo
+            from toeat.delta import replay_deltas
+            df1 = replay_deltas( apply_schema( df1 ), path )
+        return apply_schema( df1.loc[:, columns] )
+    with stage( 'read_snapshot' ):
+        # O snapshot em blocos guarda as categóricas como texto; nos demais apply_schema não muda nada
+        return apply_schema( read_snapshot( snapshot, columns ) )
+
+# ==================================================================
+# Cache por processo
+# ==================================================================
+_cache = {}
+_cache_lock = threading.Lock()
+
+# Versões dos deltas aplicados sobre o CSV (ver toeat/delta.py), num JSON ao lado do snapshot
+VERSIONS_SUFFIX = '.versions.json'
+
+# Cópias dos deltas aplicados, reaplicadas quando o snapshot é refeito a partir do CSV
+DELTAS_SUFFIX = '.deltas'
+
+NO_DELTAS = {'counter': 0, 'countries': {}, 'deltas': []}
+
+_versions_cache = {}
+
+class DeltaLogError(RuntimeError):
+    """
+    Deltas registrados em versions.json sem a cópia do arquivo: o snapshot não pode ser refeito com eles
+    """
+
+def versions_path(csv_path):
+    return os.path.splitext( csv_path )[0] + VERSIONS_SUFFIX
+
+def deltas_dir(csv_path):
+    return os.path.splitext( csv_path )[0] + DELTAS_SUFFIX
+
+def delta_versions(path=DATASET_PATH):
+    """
+    Retorna o contador de deltas aplicados sobre o CSV atual e o do último delta que mexeu em cada país.
+
+    Deltas gravados sobre outra versão do CSV não contam: um CSV completo novo refaz o snapshot e os substitui.
+    """
+    try:
+        stat = os.stat( versions_path( path ) )
+    except FileNotFoundError:
+        return NO_DELTAS
+    # O JSON só é relido quando o arquivo muda
+    key = (os.path.abspath( path ), stat.st_mtime_ns, stat.st_size)
+    versions = _versions_cache.get( key )
+    if versions is None:
+        with open( versions_path( path ), encoding='utf-8' ) as file:
+            versions = json.load( file )
+        _versions_cache.clear()
+        _versions_cache[key] = versions
+    csv_stat = os.stat( path )
+    if versions['base'] != [csv_stat.st_mtime_ns, csv_stat.st_size]:
+        return NO_DELTAS
+    return versions
+
+def record_delta(path, countries, delta_path):
+    """
+    Esta função guarda uma cópia do delta em deltas_dir, incrementa o contador de deltas e marca os países afetados com
+    o novo valor; retorna o contador
+    """
+    versions = delta_versions( path )
+    counter = versions['counter'] + 1
+    log_dir = deltas_dir( path )
+    if counter == 1 and os.path.isdir( log_dir ):
+        # Primeiro delta sobre este CSV: as cópias que sobraram são de um CSV anterior
+        shutil.rmtree( log_dir )
+    os.makedirs( log_dir, exist_ok=True )
+    name = f'{counter:06d}-{os.path.basename( delta_path )}'
+    tmp_path = os.path.join( log_dir, f'.{name}.tmp-{os.getpid()}' )
+    shutil.copyfile( delta_path, tmp_path )
+    os.replace( tmp_path, os.path.join( log_dir, name ) )
+    csv_stat = os.stat( path )
+    updated = {
+        'base': [csv_stat.st_mtime_ns, csv_stat.st_size],
+        'counter': counter,
+        'countries': {**versions['countries'], **{country: counter for country in countries}},
+        'deltas': [*versions.get( 'deltas', [] ), name],
+        }
+    output = versions_path( path )
+    tmp_path = f'{output}.tmp-{os.getpid()}'
+    with open( tmp_path, 'w', encoding='utf-8' ) as file:
+        json.dump( updated, file, ensure_ascii=False, indent=1 )
+    os.replace( tmp_path, output )
+    return counter
+
+def delta_files(path=DATASET_PATH):
+    """
+    Retorna os caminhos das cópias dos deltas registrados sobre o CSV atual, na ordem em que foram aplicados.
+
+    DeltaLogError quando falta alguma cópia (ex.: deltas aplicados antes de as cópias serem guardadas).
+    """
+    versions = delta_versions( path )
+    files = [os.path.join( deltas_dir( path ), name ) for name in versions.get( 'deltas', [] )]
+    missing = versions['counter'] - sum( os.path.exists( file ) for file in files )
+    if missing:
+        raise DeltaLogError( f"{missing} de {versions['counter']} deltas registrados em {versions_path( path )} sem cópia em "
+                             f"{deltas_dir( path )}: apague {versions_path( path )} para voltar ao CSV e aplique os deltas de novo" )
+    return files
+
+def dataset_version(path=DATASET_PATH, countries=None):
+    """
+    Retorna a versão do dataset: (mtime em nanossegundos, tamanho em bytes, contador de deltas).
+
+    Com countries, o último item é a tupla das versões desses países: caches que só dependem deles
+    não são invalidados por deltas em outros países.
+    """
+    stat = os.stat( path )
+    versions = delta_versions( path )
+    if countries is None:
+        return (stat.st_mtime_ns, stat.st_size, versions['counter'])
+    return (stat.st_mtime_ns, stat.st_size, tuple( versions['countries'].get( country, 0 ) for country in sorted( countries ) ))
+
+def load_dataset(path=DATASET_PATH, columns=None):
+    """
+    Esta função retorna o dataset limpo, reaproveitando o cache do processo enquanto o arquivo não mudar.
+
+    columns escolhe as colunas carregadas (padrão: PAGE_COLUMNS). O DataFrame retornado é
+    compartilhado entre sessões: filtre com .loc, mas não altere as colunas.
+    """
+    columns = tuple( PAGE_COLUMNS if columns is None else columns )
+    key = (os.path.abspath( path ), columns)
+    version = dataset_version( path )
+    # O lock evita que várias sessões reconstruam o mesmo dataset ao mesmo tempo
+    with _cache_lock:
+        cached = _cache.get( key )
+        if cached is None or cached[0] != version:
+            cached = (version, _read_dataset( path, list( columns ) ))
+            _cache[key] = cached
+    return cached[1]
+
+def load_derived(name, builder, path=DATASET_PATH, columns=None, update=None):
+    """
+    Esta função retorna builder(df1) para o dataset em cache, recalculando só quando o dataset é recarregado.
+
+    Serve para estruturas derivadas (agregados, índices) compartilhadas entre as sessões. Com update,
+    um delta aplicado neste processo ajusta o valor com update(valor, df1 novo, delta) em vez de recalcular
+    (ver refresh_cache).
+    """
+    df1 = load_dataset( path, columns )
+    key = ('derived', name, os.path.abspath( path ), tuple( PAGE_COLUMNS if columns is None else columns ))
+    with _cache_lock:
+        cached = _cache.get( key )
+        # O derivado vale enquanto load_dataset devolver o mesmo DataFrame
+        if cached is None or cached[0] is not df1:
+            with stage( f'build {name}' ):
+                cached = (df1, builder( df1 ), update)
+            _cache[key] = cached
+    return cached[1]
+
+def refresh_cache(path, df1, delta):
+    """
+    Esta função troca no cache do processo o dataset de path por df1 (todas as colunas, já com o delta aplicado).
+
+    Derivados com update são ajustados só nos grupos afetados pelo delta; os demais são descartados e
+    refeitos na próxima leitura.
+    """
+    path = os.path.abspath( path )
+    version = dataset_version( path )
+    with _cache_lock:
+        frames = {}
+        for key in list( _cache ):
+            if key[0] == path:
+                frames[key[1]] = df1.loc[:, list( key[1] )]
+                _cache[key] = (version, frames[key[1]])
+        for key, cached in list( _cache.items() ):
+            if key[0] != 'derived' or key[2] != path:
+                continue
+            update = cached[2]
+            if update is None or key[3] not in frames:
+                del _cache[key]
+                continue
+            with stage( f'update {key[1]}' ):
+                _cache[key] = (frames[key[3]], update( cached[1], frames[key[3]], delta ), update)
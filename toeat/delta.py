@@ -0,0 +1,161 @@
+"""
+Atualização incremental do dataset com arquivos de delta, sem refazer o pipeline do CSV completo.
+
+    python -m toeat.delta --delta novidades.csv [--csv dataset/zomato.csv]
+
+O delta é um CSV no formato do Zomato (o cabeçalho é conferido com o schema de
+toeat/schema.py) com uma coluna a mais, opcional, Operation:
+'upsert' (padrão, também com a coluna vazia ou ausente) inclui o restaurante ou
+substitui todas as suas linhas; 'delete' remove o restaurant_id (as demais
+colunas podem ficar vazias). Para um restaurant_id repetido no delta vale a
+última linha. As linhas incluídas passam pela mesma limpeza do pipeline
+(clean_rows), então um upsert que a limpeza descarta equivale a um delete.
+
+apply_delta grava o snapshot atualizado e incrementa o contador de deltas,
+global e de cada país afetado (ver dataset_version em toeat/data.py). No
+processo que aplica o delta o cache é atualizado na hora: o cubo e as listas do
+ranking de restaurantes recalculam só os grupos (país, cidade, culinária)
+afetados, e os rollups dos outros países são mantidos. Outros processos (a API,
+outra instância do Streamlit) veem o contador novo e releem o snapshot. Os
+caches de figuras e do mapa usam a versão dos países selecionados: um delta na
+Índia não invalida os gráficos do Brasil.
+
+Cada delta aplicado é copiado para dataset/zomato.deltas/ e listado em
+dataset/zomato.versions.json. Quando o snapshot é refeito a partir do CSV (nova
+regra de duplicadas, novo formato do snapshot, snapshot apagado), ensure_snapshot
+reaplica esses deltas em ordem (replay_snapshot); sem permissão de escrita, a
+leitura direto do CSV os reaplica em memória. Um CSV completo novo substitui os
+deltas: o snapshot é refeito a partir dele e o contador volta a zero. Aplique
+um delta por vez.
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from toeat.data import DATASET_PATH, clean_rows, cost_limits, delta_files, delta_versions, enrich_columns, ensure_snapshot, record_delta, refresh_cache
+from toeat.profiling import timed
+from toeat.schema import apply_schema, read_dataset_csv
+from toeat.snapshot import read_snapshot, snapshot_dedup_rule, write_snapshot
+
+OPERATION_COLUMN = 'Operation'
+ID_COLUMN = 'restaurant_id'
+OPERATIONS = ['upsert', 'delete']
+
+class DatasetDelta:
+    """
+    Linhas removidas e incluídas no dataset limpo por um delta
+    """
+    def __init__(self, ids, removed, added):
+        self.ids = ids
+        self.removed = removed
+        self.added = added
+        self.countries = set( removed['country'] ) | set( added['country'] )
+
+    def groups(self, columns):
+        """
+        Esta função retorna as combinações distintas de columns nas linhas removidas ou incluídas (os grupos afetados)
+        """
+        columns = list( columns )
+        changed = pd.concat( [self.removed.loc[:, columns].astype( object ), self.added.loc[:, columns].astype( object )] )
+        return changed.drop_duplicates().reset_index( drop=True )
+
+    def summary(self):
+        removed_ids = set( self.removed['restaurant_id'] )
+        added_ids = set( self.added['restaurant_id'] )
+        return {
+            'restaurant_ids': len( self.ids ),
+            'inserted': len( added_ids - removed_ids ),
+            'updated': len( added_ids & removed_ids ),
+            'deleted': len( removed_ids - added_ids ),
+            'rows_removed': len( self.removed ),
+            'rows_added': len( self.added ),
+            'countries': sorted( self.countries ),
+            }
+
+def read_delta(delta_path, limits=None):
+    """
+    Esta função lê o CSV de delta e retorna (linhas limpas incluídas, restaurant_ids tocados pelo delta)
+
+    limits são os limites de preço por país da limpeza (ver cost_limits); sem eles, saem das linhas do próprio delta.
+    """
+    df0 = read_dataset_csv( delta_path, extra=[OPERATION_COLUMN] )
+    if OPERATION_COLUMN in df0.columns:
+        operations = df0.pop( OPERATION_COLUMN ).fillna( 'upsert' ).str.strip().str.lower()
+    else:
+        operations = pd.Series( 'upsert', index=df0.index )
+    unknown = set( operations ) - set( OPERATIONS )
+    if unknown:
+        raise ValueError( f'operações desconhecidas no delta: {sorted( unknown )} (use {OPERATIONS})' )
+
+    # Vale a última linha de cada restaurant_id
+    last = np.flatnonzero( ~df0[ID_COLUMN].duplicated( keep='last' ).to_numpy() )
+    df0 = df0.take( last )
+    operations = operations.take( last )
+    ids = df0[ID_COLUMN].astype( 'int64' ).to_numpy()
+
+    upserts = df0.take( np.flatnonzero( (operations == 'upsert').to_numpy() ) )
+    df1 = clean_rows( enrich_columns( upserts ), limits )
+    return df1, ids
+
+def merge_delta(df1, upserts, ids):
+    """
+    Esta função remove de df1 todas as linhas dos restaurant_ids do delta e inclui as linhas novas; retorna (df1 novo, DatasetDelta)
+    """
+    removed_rows = df1['restaurant_id'].isin( ids ).to_numpy()
+    # As linhas novas ganham rótulos depois do maior índice atual
+    start = int( df1.index.max() ) + 1 if len( df1 ) else 0
+    added = apply_schema( upserts.set_axis( pd.RangeIndex( start, start + len( upserts ) ) ) )
+    merged = apply_schema( pd.concat( [df1.loc[~removed_rows, :], added] ) )
+    return merged, DatasetDelta( ids, df1.loc[removed_rows, :], added )
+
+def merge_delta_file(df1, delta_path):
+    """
+    Esta função lê o delta com os limites de preço de df1 e o aplica; retorna (df1 novo, DatasetDelta)
+    """
+    upserts, ids = read_delta( delta_path, cost_limits( df1['country_code'], df1['average_cost_for_two'] ) )
+    return merge_delta( df1, upserts, ids )
+
+def replay_deltas(df1, path=DATASET_PATH, start=0):
+    """
+    Esta função reaplica a df1 os deltas registrados sobre o CSV, a partir do de número start + 1; retorna df1 atualizado
+    """
+    for delta_path in delta_files( path )[start:]:
+        df1, _ = merge_delta_file( df1, delta_path )
+    return df1
+
+@timed()
+def replay_snapshot(path=DATASET_PATH, snapshot=None, start=0):
+    """
+    Esta função reaplica ao snapshot os deltas registrados que ele ainda não tem (os start primeiros já estão nele);
+    retorna o caminho do snapshot
+    """
+    df1 = replay_deltas( apply_schema( read_snapshot( snapshot ) ), path, start )
+    return write_snapshot( df1, snapshot, snapshot_dedup_rule( snapshot ), delta_versions( path )['counter'] )
+
+@timed()
+def apply_delta(delta_path, path=DATASET_PATH):
+    """
+    Esta função aplica o delta ao snapshot do dataset, incrementa as versões e atualiza o cache do processo; retorna o DatasetDelta
+    """
+    snapshot = ensure_snapshot( path )
+    df1, delta = merge_delta_file( apply_schema( read_snapshot( snapshot ) ), delta_path )
+    # O snapshot atualizado mantém a regra de duplicadas com que foi gravado e já conta o delta novo
+    write_snapshot( df1, snapshot, snapshot_dedup_rule( snapshot ), delta_versions( path )['counter'] + 1 )
+    record_delta( path, delta.countries, delta_path )
+    refresh_cache( path, df1, delta )
+    return delta
+
+def main(argv=None):
+    parser = argparse.ArgumentParser( description='Aplica um CSV de delta (upserts e deletes por restaurant_id) ao dataset.' )
+    parser.add_argument( '--delta', required=True, help='CSV do delta, com a coluna Operation (upsert/delete)' )
+    parser.add_argument( '--csv', default=DATASET_PATH, help='CSV do dataset (padrão: %(default)s)' )
+    args = parser.parse_args( argv )
+
+    summary = apply_delta( args.delta, args.csv ).summary()
+    print( f"{summary['restaurant_ids']} restaurantes no delta: {summary['inserted']} incluídos, {summary['updated']} atualizados, "
+           f"{summary['deleted']} removidos ({summary['rows_removed']} linhas removidas, {summary['rows_added']} incluídas)" )
+    print( f"Países afetados: {', '.join( summary['countries'] ) or '-'}" )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Conversão dos preços para uma moeda de referência, com a tabela de câmbio local dataset/fx_rates.json.
+
+A tabela tem versão (incremente ao mudar as taxas: os rollups e os ETags da API
+usam a versão), moeda de referência e data das cotações. Cada linha dá, para um
+par (country, currency) como aparece no dataset limpo, o código ISO da moeda e
+quanto vale uma unidade dela na moeda de referência. A chave é o par, e não só
+a moeda: 'Dollar($)' é o rótulo de Austrália, Canadá, Singapura e EUA, e as
+Filipinas aparecem com 'Botswana Pula(P)', mas os preços são em pesos.
+
+A conversão é vetorizada sobre as categóricas: FxTable.rates monta uma matriz
+de taxas (categorias de country x categorias de currency) e a indexa com os
+códigos das duas colunas, sem apply nem merge por linha. Como a taxa só depende
+de (country, currency), que são chaves do cubo, os gráficos convertem as somas
+do cubo, e não cada restaurante (ver cost_per_country em toeat/cube.py).
+
+    python -m toeat.fx [--fx dataset/fx_rates.json]
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+FX_PATH = 'dataset/fx_rates.json'
+
+FX_COLUMNS = ['country', 'currency', 'code', 'rate']
+
+class FxTable:
+    """
+    Tabela de câmbio: taxa de cada par (country, currency) para a moeda de referência
+    """
+    def __init__(self, version, reference, date, rates):
+        self.version = version
+        self.reference = reference
+        self.date = date
+        self.rates_table = rates
+
+    def rates(self, country, currency):
+        """
+        Esta função retorna, para cada linha, a taxa do par (country, currency) como array float64 (NaN = par fora da tabela)
+        """
+        country = pd.Series( country ).astype( 'category' )
+        currency = pd.Series( currency ).astype( 'category' )
+        matrix = np.full( (len( country.cat.categories ) + 1, len( currency.cat.categories ) + 1), np.nan )
+        rows = country.cat.categories.get_indexer( self.rates_table['country'] )
+        cols = currency.cat.categories.get_indexer( self.rates_table['currency'] )
+        found = (rows >= 0) & (cols >= 0)
+        matrix[rows[found], cols[found]] = self.rates_table['rate'].to_numpy()[found]
+        # Código -1 (valor ausente) cai na última linha/coluna da matriz, que fica NaN
+        return matrix[country.cat.codes.to_numpy(), currency.cat.codes.to_numpy()]
+
+    def convert(self, country, currency, amounts):
+        """
+        Esta função converte amounts (na moeda de cada linha) para a moeda de referência
+        """
+        return np.asarray( amounts, dtype='float64' ) * self.rates( country, currency )
+
+    def missing(self, country, currency):
+        """
+        Esta função retorna os pares (country, currency) presentes nos dados e sem taxa na tabela
+        """
+        pairs = pd.DataFrame( {'country': pd.Series( country ).astype( object ).to_numpy(),
+                               'currency': pd.Series( currency ).astype( object ).to_numpy()} )
+        pairs = pairs.loc[np.isnan( self.rates( country, currency ) ), :]
+        return sorted( set( pairs.itertuples( index=False, name=None ) ) )
+
+def read_fx_table(path=FX_PATH):
+    """
+    Esta função lê e confere a tabela de câmbio (ValueError com par repetido ou taxa que não é positiva)
+    """
+    with open( path, encoding='utf-8' ) as file:
+        content = json.load( file )
+    rates = pd.DataFrame( content['rates'] ).reindex( columns=FX_COLUMNS )
+    rates['rate'] = rates['rate'].astype( 'float64' )
+    repeated = rates.loc[rates.duplicated( ['country', 'currency'] ), ['country', 'currency']]
+    if len( repeated ):
+        raise ValueError( f'{path}: pares repetidos na tabela de câmbio: {list( repeated.itertuples( index=False, name=None ) )}' )
+    invalid = rates.loc[~(rates['rate'] > 0), 'country']
+    if len( invalid ):
+        raise ValueError( f'{path}: taxa ausente ou não positiva para {list( invalid )}' )
+    return FxTable( content['version'], content['reference'], content['date'], rates )
+
+_fx_cache = {}
+
+def load_fx_table(path=FX_PATH):
+    """
+    Esta função retorna a tabela de câmbio em cache; o JSON só é relido quando o arquivo muda
+    """
+    stat = os.stat( path )
+    key = (os.path.abspath( path ), stat.st_mtime_ns, stat.st_size)
+    table = _fx_cache.get( key )
+    if table is None:
+        table = read_fx_table( path )
+        _fx_cache.clear()
+        _fx_cache[key] = table
+    return table
+
+def main(argv=None):
+    # Import local: toeat.data só é preciso para conferir a tabela com o dataset
+    from toeat.data import DATASET_PATH, load_dataset
+
+    parser = argparse.ArgumentParser( description='Confere a tabela de câmbio com os pares (país, moeda) do dataset.' )
+    parser.add_argument( '--fx', default=FX_PATH, help='tabela de câmbio (padrão: %(default)s)' )
+    parser.add_argument( '--csv', default=DATASET_PATH, help='CSV de origem (padrão: %(default)s)' )
+    args = parser.parse_args( argv )
+
+    table = load_fx_table( args.fx )
+    df1 = load_dataset( args.csv, columns=['country', 'currency'] )
+    print( f'Tabela v{table.version}: {len( table.rates_table )} pares, cotações de {table.date} em {table.reference}' )
+    missing = table.missing( df1['country'], df1['currency'] )
+    for country, currency in missing:
+        print( f'  sem taxa: {country} / {currency}' )
+    if not missing:
+        print( 'Todos os pares (país, moeda) do dataset têm taxa.' )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+"""
+Índices de bitmap para os filtros da barra lateral (país e culinária).
+
+Para cada valor de country e cuisines guarda-se, uma vez por versão do dataset,
+a máscara das linhas com aquele valor (np.packbits: 1 bit por linha). Filtrar
+vira um OR das máscaras dos valores escolhidos e um AND entre as colunas. O
+RowFilter de cada sessão lembra a seleção anterior: incluir ou tirar um item do
+multiselect só aplica a máscara daquele item, sem varrer a coluna.
+
+Para colunas com vários valores por linha (all_cuisines), InvertedIndex guarda
+as linhas de cada valor como arrays de inteiros, sem explodir o DataFrame.
+"""
+import numpy as np
+
+from toeat.data import DATASET_PATH, load_dataset, load_derived
+from toeat.spatial import concat_ranges
+
+FILTER_COLUMNS = ['country', 'cuisines']
+
+class BitmapIndex:
+    """
+    Máscara de linhas (bits compactados) para cada valor de uma coluna
+    """
+    def __init__(self, values):
+        values = values.astype('category')
+        codes = values.cat.codes.to_numpy()
+        self.n_rows = len( codes )
+        self.empty = np.zeros( (self.n_rows + 7) // 8, dtype=np.uint8 )
+        self.masks = {value: np.packbits( codes == code ) for code, value in enumerate( values.cat.categories )}
+
+    def mask(self, value):
+        """
+        Retorna a máscara do valor; valores que não aparecem na coluna têm máscara vazia
+        """
+        return self.masks.get( value, self.empty )
+
+    def union(self, values):
+        mask = self.empty.copy()
+        for value in values:
+            mask |= self.mask( value )
+        return mask
+
+def build_indexes(df1):
+    return {col: BitmapIndex( df1[col] ) for col in FILTER_COLUMNS}
+
+def load_indexes(path=DATASET_PATH):
+    """
+    Esta função retorna os índices de bitmap do dataset em cache
+    """
+    return load_derived( 'bitmap_indexes', build_indexes, path )
+
+class InvertedIndex:
+    """
+    Linhas de cada valor de uma coluna de listas ("Italian, Pizza, Cafe"), sem explodir o DataFrame.
+
+    As posições (int32, crescentes dentro de cada valor) ficam num único array, na ordem de values;
+    as linhas de values[i] são rows[offsets[i]:offsets[i + 1]]. Cada combinação distinta da coluna
+    é separada uma vez só, e as linhas vazias (NaN) não entram em nenhum valor.
+    """
+    def __init__(self, lists, separator=',', excluded=()):
+        lists = lists.astype( 'category' )
+        codes = lists.cat.codes.to_numpy().astype( np.int64 )
+        self.n_rows = len( codes )
+        # Valores de cada combinação, sem repetição e na ordem em que aparecem
+        split = [list( dict.fromkeys( value.strip() for value in str( combination ).split( separator )
+                                      if value.strip() and value.strip() not in excluded ) )
+                 for combination in lists.cat.categories]
+        self.values = sorted( {value for values in split for value in values} )
+        value_ids = {value: number for number, value in enumerate( self.values )}
+        flat = np.array( [value_ids[value] for values in split for value in values], dtype=np.int32 )
+        # Uma combinação vazia a mais no fim, para as linhas NaN (código -1)
+        lengths = np.array( [len( values ) for values in split] + [0], dtype=np.int64 )
+        starts = np.concatenate( [[0], np.cumsum( lengths )[:-1]] )
+        codes[codes < 0] = len( split )
+        row_lengths = lengths[codes]
+        row_values = flat[concat_ranges( starts[codes], starts[codes] + row_lengths )]
+        rows = np.repeat( np.arange( self.n_rows, dtype=np.int32 ), row_lengths )
+        order = np.argsort( row_values, kind='stable' )
+        self.rows = rows[order]
+        self.offsets = np.concatenate( [[0], np.cumsum( np.bincount( row_values, minlength=len( self.values ) ) )] ).astype( np.int64 )
+
+    def __len__(self):
+        return len( self.rows )
+
+    @property
+    def nbytes(self):
+        return self.rows.nbytes + self.offsets.nbytes
+
+    def value_ids(self):
+        """
+        Esta função retorna, para cada item de rows, o número do valor (posição em values) a que ele pertence
+        """
+        return np.repeat( np.arange( len( self.values ), dtype=np.int32 ), np.diff( self.offsets ) )
+
+    def value_mask(self, values=None):
+        """
+        Esta função retorna a máscara dos valores escolhidos, na ordem de self.values (None = todos)
+        """
+        if values is None:
+            return np.ones( len( self.values ), dtype=bool )
+        return np.isin( np.array( self.values, dtype=object ), list( values ) )
+
+    def positions(self, value):
+        """
+        Esta função retorna as linhas que listam value (vazio para valores que não aparecem)
+        """
+        number = np.searchsorted( self.values, value )
+        if number == len( self.values ) or self.values[number] != value:
+            return self.rows[:0]
+        return self.rows[self.offsets[number]:self.offsets[number + 1]]
+
+    def row_mask(self, values):
+        """
+        Esta função retorna a máscara das linhas que listam pelo menos um dos valores
+        """
+        mask = np.zeros( self.n_rows, dtype=bool )
+        for value in values:
+            mask[self.positions( value )] = True
+        return mask
+
+class FilteredView:
+    """
+    Linhas selecionadas de df1 sem copiar o DataFrame: cada coluna só é copiada quando lida
+    """
+    def __init__(self, df1, positions):
+        self.df1 = df1
+        self.positions = positions
+        self._columns = {}
+
+    def __len__(self):
+        return len( self.positions )
+
+    def __getitem__(self, column):
+        if column not in self._columns:
+            self._columns[column] = self.df1[column].take( self.positions )
+        return self._columns[column]
+
+    def frame(self, columns=None):
+        """
+        Esta função materializa as linhas selecionadas (só das colunas pedidas) num DataFrame
+        """
+        df1 = self.df1 if columns is None else self.df1.loc[:, columns]
+        return df1.take( self.positions )
+
+class RowFilter:
+    """
+    Seleção de uma sessão sobre os índices de bitmap, atualizada de forma incremental.
+
+    Cada linha tem um único valor em cada coluna de FILTER_COLUMNS, então as máscaras de valores
+    diferentes não se sobrepõem e tirar um valor da seleção é só um AND com a máscara invertida.
+    """
+    def __init__(self, df1, indexes):
+        self.df1 = df1
+        self.indexes = indexes
+        self.selected = {}
+        self.masks = {}
+        self._positions = {}
+
+    def select(self, column, values):
+        """
+        Esta função atualiza a seleção de column, aplicando só os valores incluídos ou retirados (None = todos os valores)
+        """
+        if values is None:
+            return self.clear( column )
+        index = self.indexes[column]
+        values = frozenset( values )
+        old_values = self.selected.get( column )
+        if values == old_values:
+            return self
+        if old_values is None or len( values ^ old_values ) > len( values ):
+            # Mudou quase tudo: mais barato refazer o OR do zero
+            mask = index.union( values )
+        else:
+            mask = self.masks[column]
+            for value in values - old_values:
+                mask |= index.mask( value )
+            for value in old_values - values:
+                mask &= ~index.mask( value )
+        self.selected[column] = values
+        self.masks[column] = mask
+        self._positions.clear()
+        return self
+
+    def clear(self, column):
+        """
+        Esta função retira o filtro de column: todas as linhas passam nele
+        """
+        if column in self.masks:
+            del self.selected[column]
+            del self.masks[column]
+            self._positions.clear()
+        return self
+
+    def positions(self, columns=None):
+        """
+        Esta função retorna as posições (iloc) das linhas que passam nos filtros de columns (padrão: todos os filtros ativos)
+        """
+        columns = tuple( self.masks if columns is None else [column for column in columns if column in self.masks] )
+        if columns not in self._positions:
+            n_rows = len( self.df1 )
+            if not columns:
+                self._positions[columns] = np.arange( n_rows )
+            else:
+                mask = self.masks[columns[0]].copy()
+                for column in columns[1:]:
+                    mask &= self.masks[column]
+                self._positions[columns] = np.flatnonzero( np.unpackbits( mask, count=n_rows ) )
+        return self._positions[columns]
+
+    def view(self, columns=None):
+        return FilteredView( self.df1, self.positions( columns ) )
+
+def session_filter(state, key='row_filter', path=DATASET_PATH):
+    """
+    Esta função retorna o RowFilter guardado em state (ex.: st.session_state), recriando-o quando o dataset muda
+    """
+    df1 = load_dataset( path )
+    indexes = load_indexes( path )
+    row_filter = state.get( key )
+    if row_filter is None or row_filter.indexes is not indexes:
+        row_filter = RowFilter( df1, indexes )
+        state[key] = row_filter
+    return row_filter
@@ -0,0 +1,140 @@
+"""
+Ingestão do CSV em blocos, para exportações maiores que a memória.
+
+    python -m toeat.ingest [--csv dataset/zomato.csv] [--output dataset/zomato.feather] [--chunksize 100000] [--dedup-rule latest]
+
+Uma primeira passada lê só as colunas restaurant_id, votes, country_code e
+average_cost_for_two, escolhe a linha mantida de cada restaurant_id
+(keep_positions, a mesma regra de clean_code) e calcula, sobre as linhas
+mantidas, os limites de preço de cada país (cost_limits): 26 bytes por linha,
+em vez do DataFrame inteiro que a remoção de duplicadas precisaria. Na segunda
+passada cada bloco de CHUNK_ROWS linhas fica só com as linhas escolhidas e passa
+por enrich_columns e clean_rows, com os limites do CSV inteiro. Os
+blocos limpos são gravados um a um no snapshot (Arrow IPC, o mesmo formato do
+Feather). O pico de memória fica no tamanho de um bloco mais os ids, qualquer
+que seja o tamanho do CSV. O cubo de agregados é montado depois, sobre o
+snapshot carregado (load_cube), como nos outros caminhos.
+
+No snapshot em blocos as colunas categóricas ficam como texto; o schema compacto
+é aplicado na leitura (ver toeat/data.py).
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pyarrow as pa
+
+from toeat.data import DATASET_PATH, DEDUP_RULE, DEDUP_RULES, clean_rows, cost_limits, enrich_columns, keep_positions, replay_pending
+from toeat.profiling import timed
+from toeat.schema import DTYPES, read_dataset_csv
+from toeat.snapshot import snapshot_path, with_format
+
+# Linhas por bloco
+CHUNK_ROWS = 100_000
+
+# Colunas lidas na primeira passada
+ID_COLUMN = 'restaurant_id'
+VOTES_COLUMN = 'votes'
+COUNTRY_CODE_COLUMN = 'country_code'
+COST_COLUMN = 'average_cost_for_two'
+
+# Tipos do schema que valem para cada bloco isolado (as categorias só são conhecidas no fim)
+STORAGE_DTYPES = {col: dtype for col, dtype in DTYPES.items() if dtype != 'category'}
+
+def kept_rows(path, dedup_rule=DEDUP_RULE, chunksize=CHUNK_ROWS):
+    """
+    Esta função lê só os ids, os votos, os países e os preços do CSV; retorna (máscara das linhas mantidas pela remoção
+    de duplicadas, limites de preço por país calculados sobre essas linhas)
+    """
+    columns = [ID_COLUMN, VOTES_COLUMN, COUNTRY_CODE_COLUMN, COST_COLUMN]
+    dtypes = ['int64', 'int64', 'int16', 'float64']
+    parts = [[] for _ in columns]
+    for chunk in read_dataset_csv( path, columns, chunksize=chunksize ):
+        for part, col, dtype in zip( parts, columns, dtypes ):
+            part.append( chunk[col].to_numpy( dtype=dtype ) )
+    ids, votes, country_codes, costs = [np.concatenate( part ) if part else np.empty( 0, dtype=dtype )
+                                        for part, dtype in zip( parts, dtypes )]
+    positions = keep_positions( ids, votes, dedup_rule )
+    keep = np.zeros( len( ids ), dtype=bool )
+    keep[positions] = True
+    return keep, cost_limits( country_codes[positions], costs[positions] )
+
+def storage_table(df1):
+    """
+    Esta função converte um bloco limpo em tabela Arrow com tipos fixos (texto para as colunas de objeto)
+    """
+    df1 = df1.astype( {col: dtype for col, dtype in STORAGE_DTYPES.items() if col in df1.columns} )
+    table = pa.Table.from_pandas( df1, preserve_index=True )
+    schema = pa.schema( [pa.field( field.name, pa.string() ) if field.type == pa.null() else field for field in table.schema],
+                        metadata=table.schema.metadata )
+    return table.cast( schema )
+
+@timed()
+def ingest_csv(path=DATASET_PATH, output=None, chunksize=CHUNK_ROWS, dedup_rule=DEDUP_RULE):
+    """
+    Esta função lê o CSV em blocos, limpa cada bloco e grava o snapshot; retorna (caminho, estatísticas)
+    """
+    if output is None:
+        output = snapshot_path( path )
+    start = time.perf_counter()
+    keep, limits = kept_rows( path, dedup_rule, chunksize )
+    dedup_seconds = time.perf_counter() - start
+    rows_read = rows_written = 0
+    tmp_path = f'{output}.tmp-{os.getpid()}'
+    writer = None
+    try:
+        for chunk in read_dataset_csv( path, chunksize=chunksize ):
+            chunk_keep = keep[rows_read:rows_read + len( chunk )]
+            rows_read += len( chunk )
+            df1 = enrich_columns( chunk.take( np.flatnonzero( chunk_keep ) ) )
+            df1 = clean_rows( df1, limits )
+            table = storage_table( df1 )
+            if writer is None:
+                schema = with_format( table.schema, dedup_rule )
+                writer = pa.ipc.new_file( tmp_path, schema )
+            writer.write_table( table.cast( schema ) )
+            rows_written += len( df1 )
+        if writer is None:
+            # CSV só com o cabeçalho: grava uma tabela vazia com o mesmo schema dos blocos
+            table = storage_table( clean_rows( enrich_columns( read_dataset_csv( path, nrows=0 ) ), limits ) )
+            writer = pa.ipc.new_file( tmp_path, with_format( table.schema, dedup_rule ) )
+            writer.write_table( table )
+        writer.close()
+        writer = None
+        os.replace( tmp_path, output )
+    finally:
+        if writer is not None:
+            writer.close()
+        if os.path.exists( tmp_path ):
+            os.remove( tmp_path )
+    stats = {
+        'rows_read': rows_read,
+        'duplicates': int( len( keep ) - keep.sum() ),
+        'dedup_rule': dedup_rule,
+        'dedup_seconds': round( dedup_seconds, 3 ),
+        'rows_written': rows_written,
+        'seconds': round( time.perf_counter() - start, 3 ),
+        }
+    return output, stats
+
+def main(argv=None):
+    parser = argparse.ArgumentParser( description='Gera o snapshot do dataset limpo lendo o CSV em blocos.' )
+    parser.add_argument( '--csv', default=DATASET_PATH, help='CSV de origem (padrão: %(default)s)' )
+    parser.add_argument( '--output', default=None, help='arquivo de saída (padrão: CSV com extensão .feather)' )
+    parser.add_argument( '--chunksize', type=int, default=CHUNK_ROWS, help='linhas por bloco (padrão: %(default)s)' )
+    parser.add_argument( '--dedup-rule', default=DEDUP_RULE, choices=DEDUP_RULES,
+                         help='linha mantida por restaurant_id (padrão: %(default)s)' )
+    args = parser.parse_args( argv )
+
+    output, stats = ingest_csv( args.csv, args.output, args.chunksize, args.dedup_rule )
+    # O snapshot do dataset não fica sem os deltas registrados (ver toeat/delta.py)
+    replayed = replay_pending( args.csv, output ) if output == snapshot_path( args.csv ) else 0
+    print( f'Snapshot gravado em {output} ({os.path.getsize( output ) / 1e6:.1f} MB)' )
+    print( f"{stats['rows_read']} linhas lidas, {stats['duplicates']} duplicadas por restaurant_id ({stats['dedup_rule']}, "
+           f"{stats['dedup_seconds']} s), {stats['rows_written']} gravadas em {stats['seconds']} s" )
+    if replayed:
+        print( f'{replayed} deltas registrados reaplicados' )
+
+if __name__ == '__main__':
+    main()
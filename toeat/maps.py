@@ -0,0 +1,306 @@
+"""
+Construção do mapa de restaurantes da Main Page.
+
+restaurant_map cria um marcador por restaurante e deixa o agrupamento para o
+MarkerCluster no navegador. Com muitos restaurantes, cluster_layer agrupa os
+pontos numa grade no servidor, de acordo com o zoom atual: só os centróides
+(com quantidade e nota média) vão para o navegador, e células com poucos
+restaurantes viram marcadores individuais. A Main Page só agrupa os
+restaurantes da janela visível (viewport_bbox e o índice de toeat/spatial.py).
+
+fast_restaurant_map também mostra todos os restaurantes, mas monta os dados de
+forma vetorizada num único array do FastMarkerCluster; os popups são gerados
+no navegador, no clique, a partir de uma tabela compacta de propriedades. O
+HTML desse mapa fica num cache LRU por seleção de países (cached_map_html).
+"""
+import json
+
+from branca.element import Element
+import folium
+from folium.plugins import FastMarkerCluster, MarkerCluster
+from jinja2 import Template
+import numpy as np
+
+from toeat.cache import LRUCache
+from toeat.profiling import timed
+
+ICONE = 'fa-cutlery'
+
+# Zoom inicial do mapa agrupado (mundo inteiro)
+DEFAULT_ZOOM = 2
+
+# Tamanho da célula da grade em pixels de tela (tiles de 256 px)
+CELL_PIXELS = 80
+
+# Células com até esta quantidade de restaurantes viram marcadores individuais
+MAX_SINGLE_MARKERS = 5
+
+# Cor do agrupamento pela nota média, nas mesmas faixas das cores do Zomato
+RATING_COLORS = [
+    (4.5, 'darkgreen'),
+    (4.0, 'green'),
+    (3.5, 'lightgreen'),
+    (3.0, 'orange'),
+    (2.5, 'red'),
+    ]
+LOWEST_RATING_COLOR = 'darkred'
+
+def restaurant_marker( location_info ):
+    """
+    Esta função cria o marcador de um restaurante, com ícone na cor da avaliação e popup com os detalhes
+    """
+    return folium.Marker([location_info['latitude'],
+                          location_info['longitude']],
+                          icon=folium.Icon(color=location_info['rating_color_name'], icon=ICONE, prefix='fa'),
+                          popup = folium.Popup(f"""<h6> <b> {location_info['restaurant_name']} </b> </h6> <br>
+                          Cozinha: {location_info['cuisines']} <br>
+                          Preço médio para dois: {location_info['average_cost_for_two'], location_info['currency']} <br>
+                          Avaliação: {location_info['aggregate_rating']:.1f} / 5.0 <br>""",
+                          max_width = len(f"{location_info['restaurant_name']}")*20))
+
+def restaurant_map( df1 ):
+    """
+    Esta função cria o mapa com um marcador por restaurante, agrupados pelo MarkerCluster no navegador
+    """
+    fig = folium.Figure(width=1024, height=600)
+
+    # Cria o objeto map e adiciona ao painel
+    mapa = folium.Map(max_bounds=True).add_to(fig)
+
+    marker_cluster = MarkerCluster().add_to(mapa)
+
+    for index, location_info in df1.iterrows():
+        restaurant_marker( location_info ).add_to(marker_cluster)
+
+    return mapa
+
+def rating_color( rating ):
+    """
+    Retorna o nome da cor correspondente a uma nota média
+    """
+    for limit, color in RATING_COLORS:
+        if rating >= limit:
+            return color
+    return LOWEST_RATING_COLOR
+
+def grid_clusters( df1, zoom, cell_pixels=CELL_PIXELS, max_single=MAX_SINGLE_MARKERS ):
+    """
+    Esta função agrupa os restaurantes em células de uma grade cujo tamanho acompanha o zoom.
+
+    Retorna (clusters, singles): clusters tem o centróide (latitude, longitude), count e a nota média
+    (aggregate_rating) das células com mais de max_single restaurantes; singles tem as linhas de df1
+    que caem nas demais células e devem virar marcadores individuais.
+    """
+    # Largura do mundo em pixels no zoom atual: 256 * 2^zoom
+    cell = 360.0 * cell_pixels / (256 * 2 ** zoom)
+    cell_x = np.floor( df1['longitude'].to_numpy() / cell ).astype('int64')
+    cell_y = np.floor( df1['latitude'].to_numpy() / cell ).astype('int64')
+
+    grouped = df1.loc[:, ['latitude', 'longitude', 'aggregate_rating']].groupby([cell_y, cell_x], sort=False)
+    clusters = grouped.mean()
+    clusters['count'] = grouped.size()
+
+    is_small = clusters['count'].to_numpy() <= max_single
+    singles = df1.loc[is_small[grouped.ngroup().to_numpy()], :]
+    clusters = clusters.loc[~is_small, :].reset_index(drop=True)
+    return clusters, singles
+
+def cluster_marker( cluster ):
+    """
+    Esta função cria o marcador de um agrupamento: círculo com a quantidade, colorido pela nota média
+    """
+    count = int( cluster['count'] )
+    rating = float( cluster['aggregate_rating'] )
+    size = int( 30 + 8 * np.log10( count ) )
+    html = (f'<div style="width:{size}px;height:{size}px;line-height:{size}px;border-radius:50%;'
+            f'background:{rating_color( rating )};opacity:0.85;color:white;font-weight:bold;'
+            f'text-align:center;font-size:12px">{count}</div>')
+    return folium.Marker([cluster['latitude'], cluster['longitude']],
+                         icon=folium.DivIcon(html=html, icon_size=(size, size), icon_anchor=(size // 2, size // 2)),
+                         tooltip=f'{count} restaurantes - nota média {rating:.1f} / 5.0')
+
+@timed()
+def cluster_layer( df1, zoom ):
+    """
+    Esta função monta a camada do mapa agrupado no servidor para o zoom atual
+    """
+    clusters, singles = grid_clusters( df1, zoom )
+    layer = folium.FeatureGroup(name='Restaurantes')
+    for cluster in clusters.to_dict('records'):
+        cluster_marker( cluster ).add_to(layer)
+    for location_info in singles.to_dict('records'):
+        restaurant_marker( location_info ).add_to(layer)
+    return layer
+
+# Margem em volta da janela visível, em frações do tamanho dela: arrastar um pouco o mapa não deixa bordas vazias
+VIEWPORT_MARGIN = 0.5
+
+def viewport_bbox( bounds, margin=VIEWPORT_MARGIN ):
+    """
+    Esta função converte os bounds do Leaflet (como o st_folium devolve) em (south, west, north, east) com a margem.
+
+    Longitudes fora de [-180, 180] (mapa dando a volta no globo) são normalizadas; retorna None sem bounds.
+    """
+    try:
+        south, west = float( bounds['_southWest']['lat'] ), float( bounds['_southWest']['lng'] )
+        north, east = float( bounds['_northEast']['lat'] ), float( bounds['_northEast']['lng'] )
+    except (KeyError, TypeError, ValueError):
+        return None
+    height, width = north - south, east - west
+    south, north = max( south - margin * height, -90.0 ), min( north + margin * height, 90.0 )
+    west, east = west - margin * width, east + margin * width
+    if east - west >= 360:
+        return south, -180.0, north, 180.0
+    return south, (west + 180) % 360 - 180, north, (east + 180) % 360 - 180
+
+def base_map():
+    """
+    Esta função cria o mapa vazio usado pelo modo agrupado; os marcadores entram por cluster_layer
+    """
+    return folium.Map(location=[0, 0], zoom_start=DEFAULT_ZOOM, max_bounds=True)
+
+# Cada marcador do fast_restaurant_map é uma linha
+# [latitude, longitude, cor, nome, culinária, preço para dois, moeda, nota];
+# cor, culinária e moeda são índices nas tabelas enviadas junto com o callback
+FAST_MARKER_CALLBACK = """
+    var lookups = %s;
+    var popupHtml = function (row) {
+        return '<h6> <b> ' + row[3] + ' </b> </h6> <br>' +
+               'Cozinha: ' + lookups.cuisines[row[4]] + ' <br>' +
+               'Preço médio para dois: (' + row[5] + ", '" + lookups.currencies[row[6]] + "') <br>" +
+               'Avaliação: ' + row[7].toFixed(1) + ' / 5.0 <br>';
+    };
+    var callback = function (row) {
+        var marker = L.marker(new L.LatLng(row[0], row[1]));
+        marker.setIcon(L.AwesomeMarkers.icon({icon: '%s', prefix: 'fa', markerColor: lookups.colors[row[2]]}));
+        marker.bindPopup(function () { return popupHtml(row); }, {maxWidth: row[3].length * 20});
+        return marker;
+    };"""
+
+def html_safe_json( value ):
+    """
+    Serializa para JSON que pode ser embutido num <script> (mesmo escape do filtro tojson do jinja)
+    """
+    return (json.dumps( value )
+            .replace('<', '\\u003c')
+            .replace('>', '\\u003e')
+            .replace('&', '\\u0026'))
+
+class RawScript(Element):
+    """
+    Trecho de JavaScript inserido como está, sem passar pelo jinja
+    """
+    def __init__(self, text):
+        super().__init__()
+        self.text = text
+
+    def render(self, **kwargs):
+        return self.text
+
+class LazyPopupMarkerCluster(FastMarkerCluster):
+    """
+    FastMarkerCluster que recebe os dados já validados e gera os popups só no clique
+    """
+    # Os dados vão num <script> próprio (RawScript): o branca recompila como template
+    # todo script renderizado, o que com milhões de linhas domina o tempo de render
+    _template = Template(
+        """
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = (function(){
+                {{ this.callback }}
+
+                var data = {{ this.get_name() }}_data;
+                var cluster = L.markerClusterGroup({{ this.options|tojson }});
+
+                for (var i = 0; i < data.length; i++) {
+                    var row = data[i];
+                    var marker = callback(row);
+                    marker.addTo(cluster);
+                }
+
+                cluster.addTo({{ this._parent.get_name() }});
+                return cluster;
+            })();
+        {% endmacro %}"""
+    )
+
+    def __init__(self, data, lookups, **kwargs):
+        # Passa uma lista vazia para não validar linha a linha no FastMarkerCluster
+        super().__init__([], **kwargs)
+        self.data_json = html_safe_json( data )
+        self.callback = FAST_MARKER_CALLBACK % (html_safe_json( lookups ), ICONE)
+
+    def render(self, **kwargs):
+        self.get_root().script.add_child( RawScript( f'var {self.get_name()}_data = {self.data_json};' ),
+                                          name=f'{self.get_name()}_data' )
+        super().render(**kwargs)
+
+def fast_marker_data( df1 ):
+    """
+    Esta função monta, sem laço por linha, os dados e as tabelas de propriedades do fast_restaurant_map
+    """
+    latitude = df1['latitude'].astype('float64')
+    longitude = df1['longitude'].astype('float64')
+    valid = latitude.between(-90, 90) & longitude.between(-180, 180)
+
+    colors = df1.loc[valid, 'rating_color_name'].astype('category').cat.remove_unused_categories()
+    cuisines = df1.loc[valid, 'cuisines'].astype('category').cat.remove_unused_categories()
+    currencies = df1.loc[valid, 'currency'].astype('category').cat.remove_unused_categories()
+    columns = [
+        latitude[valid].round(6),
+        longitude[valid].round(6),
+        colors.cat.codes,
+        df1.loc[valid, 'restaurant_name'].astype(str),
+        cuisines.cat.codes,
+        df1.loc[valid, 'average_cost_for_two'],
+        currencies.cat.codes,
+        df1.loc[valid, 'aggregate_rating'].astype('float64').round(1),
+        ]
+    data = list(map(list, zip(*[col.tolist() for col in columns])))
+    lookups = {
+        'colors': colors.cat.categories.tolist(),
+        'cuisines': cuisines.cat.categories.tolist(),
+        'currencies': currencies.cat.categories.tolist(),
+        }
+    return data, lookups
+
+@timed()
+def fast_restaurant_map( df1 ):
+    """
+    Esta função cria o mapa com todos os restaurantes num único FastMarkerCluster
+    """
+    fig = folium.Figure(width=1024, height=600)
+    mapa = folium.Map(max_bounds=True).add_to(fig)
+    data, lookups = fast_marker_data( df1 )
+    LazyPopupMarkerCluster( data, lookups ).add_to(mapa)
+    return mapa
+
+# ==================================================================
+# Cache do HTML do mapa
+# ==================================================================
+# Largura e altura usadas pelo folium_static
+MAP_WIDTH = 700
+MAP_HEIGHT = 500
+
+# Limite do cache de HTML, em caracteres (um mapa com todos os restaurantes tem ~1 MB)
+MAP_HTML_CACHE_SIZE = 256 * 2**20
+
+MAP_HTML_CACHE = LRUCache( MAP_HTML_CACHE_SIZE )
+
+@timed()
+def map_html( mapa ):
+    """
+    Esta função gera o mesmo HTML que o folium_static envia ao navegador
+    """
+    return folium.Figure().add_child( mapa ).render()
+
+def cached_map_html( df1, countries, version, builder=fast_restaurant_map ):
+    """
+    Esta função retorna o HTML do mapa, reaproveitando o cache para a mesma seleção de países.
+
+    A chave é (builder, países ordenados, versão do dataset). df1 é o DataFrame já filtrado por countries,
+    ou uma função que o retorna, chamada só quando o HTML não está em cache.
+    """
+    key = (builder.__name__, tuple( sorted( countries ) ), version)
+    load_frame = df1 if callable( df1 ) else lambda: df1
+    return MAP_HTML_CACHE.get_or_create( key, lambda: map_html( builder( load_frame() ) ) )
@@ -0,0 +1,153 @@
+"""
+Limpeza e agregação do dataset em paralelo, num pool de processos, com o CSV particionado por country_code.
+
+    python -m toeat.parallel [--csv dataset/zomato.csv] [--output dataset/zomato.feather] [--workers 4]
+
+O processo principal lê o CSV, remove as duplicadas por restaurant_id (a regra
+olha o arquivo inteiro) e grava as linhas brutas, agrupadas por country_code,
+num arquivo Arrow IPC temporário. Cada tarefa recebe só (arquivo, início,
+tamanho): o processo filho abre o arquivo com memory map e lê a sua fatia sem
+cópia, roda enrich_columns e clean_rows (com os limites de preço por país
+calculados pelo processo principal sobre o CSV inteiro), grava o resultado em
+outro arquivo IPC e devolve apenas o caminho e o cubo parcial (poucas linhas).
+Nenhum DataFrame inteiro passa pelo pickle. No fim as fatias limpas são lidas
+com memory map, voltam à ordem do CSV e os cubos parciais são somados.
+
+Países com mais de PARTITION_ROWS linhas são divididos em fatias (a limpeza
+trata cada linha isoladamente), para um país dominante não virar o gargalo. O
+pool usa 'spawn': os filhos não herdam as threads do Streamlit.
+
+Com TOEAT_WORKERS maior que 1 o snapshot é refeito por este caminho (ver toeat/data.py).
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+import tempfile
+import time
+
+import numpy as np
+import pyarrow as pa
+
+from toeat.cube import build_cube, merge_cubes
+from toeat.data import DATASET_PATH, DEDUP_RULE, DEDUP_RULES, clean_rows, cost_limits, enrich_columns, keep_positions, replay_pending
+from toeat.ingest import COST_COLUMN, ID_COLUMN, VOTES_COLUMN, storage_table
+from toeat.profiling import stage, timed
+from toeat.schema import TEXT_COLUMNS, apply_schema, read_dataset_csv
+from toeat.snapshot import snapshot_path, write_snapshot
+
+COUNTRY_CODE_COLUMN = 'country_code'
+
+# Maior fatia entregue a um processo
+PARTITION_ROWS = 50_000
+
+def default_workers():
+    return os.cpu_count() or 1
+
+def partitions(country_codes, max_rows=PARTITION_ROWS):
+    """
+    Esta função retorna as fatias (início, tamanho) das linhas já ordenadas por country_code, das maiores para as menores
+    """
+    country_codes = np.asarray( country_codes )
+    bounds = np.flatnonzero( np.diff( country_codes ) ) + 1
+    starts = np.concatenate( [[0], bounds] )
+    ends = np.concatenate( [bounds, [len( country_codes )]] )
+    slices = [(int( first ), int( min( first + max_rows, end ) - first ))
+              for start, end in zip( starts, ends ) for first in range( start, end, max_rows )]
+    # As maiores primeiro: o pool termina mais cedo quando as pequenas ficam para o fim
+    return sorted( slices, key=lambda item: -item[1] )
+
+def write_ipc(table, path):
+    with pa.ipc.new_file( path, table.schema ) as writer:
+        writer.write_table( table )
+    return path
+
+def read_ipc(path):
+    """
+    Esta função abre o arquivo Arrow IPC com memory map (os buffers das colunas não são copiados)
+    """
+    return pa.ipc.open_file( pa.memory_map( path ) ).read_all()
+
+def clean_partition(source, start, length, output, limits):
+    """
+    Esta função roda no processo filho: limpa as linhas [start, start + length) do arquivo source e grava em output
+    (limits: limites de preço por país, ver cost_limits)
+    """
+    df0 = read_ipc( source ).slice( start, length ).to_pandas()
+    # O Arrow devolve texto ausente como None; a limpeza espera NaN, como no read_csv
+    text_columns = [col for col in TEXT_COLUMNS if col in df0.columns]
+    df0[text_columns] = df0[text_columns].fillna( np.nan )
+    df1 = clean_rows( enrich_columns( df0 ), limits )
+    write_ipc( storage_table( df1 ), output )
+    return output, build_cube( df1 )
+
+@timed()
+def build_dataset_parallel(path=DATASET_PATH, workers=None, dedup_rule=DEDUP_RULE, max_rows=PARTITION_ROWS):
+    """
+    Esta função executa o pipeline do CSV num pool de processos; retorna (df1 com o schema compacto, cubo, estatísticas)
+    """
+    workers = workers or default_workers()
+    start = time.perf_counter()
+    with stage( 'read_csv' ):
+        df0 = read_dataset_csv( path )
+    rows_read = len( df0 )
+    with stage( 'dedup_restaurants' ):
+        df0 = df0.iloc[keep_positions( df0[ID_COLUMN], df0[VOTES_COLUMN], dedup_rule )]
+        # Os limites olham o país inteiro, que pode estar dividido em várias fatias
+        limits = cost_limits( df0[COUNTRY_CODE_COLUMN], df0[COST_COLUMN] )
+    with stage( 'partition' ):
+        # O índice (posição no CSV) vai junto para refazer a ordem original no fim
+        df0 = df0.sort_values( COUNTRY_CODE_COLUMN, kind='stable' )
+        slices = partitions( df0[COUNTRY_CODE_COLUMN], max_rows )
+
+    with tempfile.TemporaryDirectory( prefix='toeat-parallel-' ) as tmp_dir:
+        source = write_ipc( pa.Table.from_pandas( df0, preserve_index=True ), os.path.join( tmp_dir, 'raw.arrow' ) )
+        del df0
+        with stage( 'clean_partitions' ), ProcessPoolExecutor( workers, mp_context=multiprocessing.get_context( 'spawn' ) ) as pool:
+            futures = [pool.submit( clean_partition, source, first, length, os.path.join( tmp_dir, f'clean-{number}.arrow' ), limits )
+                       for number, (first, length) in enumerate( slices )]
+            results = [future.result() for future in futures]
+        with stage( 'merge_partitions' ):
+            tables = [read_ipc( output ) for output, _ in results]
+            schema = tables[0].schema
+            df1 = pa.concat_tables( [table.cast( schema ) for table in tables] ).to_pandas()
+            df1 = apply_schema( df1.sort_index( kind='stable' ) )
+            cube = merge_cubes( [partial for _, partial in results] )
+    stats = {
+        'rows_read': rows_read,
+        'rows_written': len( df1 ),
+        'partitions': len( slices ),
+        'workers': workers,
+        'seconds': round( time.perf_counter() - start, 3 ),
+        }
+    return df1, cube, stats
+
+def build_snapshot_parallel(path=DATASET_PATH, output=None, workers=None, dedup_rule=DEDUP_RULE):
+    """
+    Esta função gera o snapshot com build_dataset_parallel; retorna (caminho gravado, estatísticas)
+    """
+    if output is None:
+        output = snapshot_path( path )
+    df1, _, stats = build_dataset_parallel( path, workers, dedup_rule )
+    return write_snapshot( df1, output, dedup_rule ), stats
+
+def main(argv=None):
+    parser = argparse.ArgumentParser( description='Gera o snapshot do dataset limpo com um pool de processos.' )
+    parser.add_argument( '--csv', default=DATASET_PATH, help='CSV de origem (padrão: %(default)s)' )
+    parser.add_argument( '--output', default=None, help='arquivo de saída (padrão: CSV com extensão .feather)' )
+    parser.add_argument( '--workers', type=int, default=default_workers(), help='processos (padrão: %(default)s)' )
+    parser.add_argument( '--dedup-rule', default=DEDUP_RULE, choices=DEDUP_RULES,
+                         help='linha mantida por restaurant_id (padrão: %(default)s)' )
+    args = parser.parse_args( argv )
+
+    output, stats = build_snapshot_parallel( args.csv, args.output, args.workers, args.dedup_rule )
+    # O snapshot do dataset não fica sem os deltas registrados (ver toeat/delta.py)
+    replayed = replay_pending( args.csv, output ) if output == snapshot_path( args.csv ) else 0
+    print( f'Snapshot gravado em {output} ({os.path.getsize( output ) / 1e6:.1f} MB)' )
+    print( f"{stats['rows_read']} linhas lidas, {stats['rows_written']} gravadas; {stats['partitions']} fatias "
+           f"em {stats['workers']} processos, {stats['seconds']} s" )
+    if replayed:
+        print( f'{replayed} deltas registrados reaplicados' )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+"""
+Medição de tempo e pico de memória por etapa de cada execução de página.
+
+Desligada por padrão. Liga com a variável de ambiente TOEAT_PROFILE=1 ou com
+?profile=1 na URL da página. Com TOEAT_PROFILE_LOG=arquivo.jsonl cada execução
+também é gravada como uma linha JSON, para análise offline.
+
+As páginas chamam start_page_profiler no início e finish_page_profiler no fim,
+que mostra as etapas numa seção recolhível da barra lateral. No meio, qualquer
+código marca etapas com o gerenciador de contexto stage ou o decorador timed:
+
+    with stage( 'plotly' ):
+        fig = ...
+
+    @timed()
+    def build_dataset(path): ...
+
+Sem profiler ativo, stage e timed não fazem nada. O pico de memória vem do
+tracemalloc, que só é ligado junto com o profiler (ele deixa as alocações
+mais lentas); o pico de uma etapa inclui as etapas internas a ela.
+"""
+import contextlib
+import contextvars
+import datetime
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+import weakref
+
+import pandas as pd
+
+PROFILE_ENV = 'TOEAT_PROFILE'
+PROFILE_LOG_ENV = 'TOEAT_PROFILE_LOG'
+PROFILE_QUERY_PARAM = 'profile'
+
+# Profiler da execução atual (o Streamlit roda cada execução de página na sua thread)
+_active = contextvars.ContextVar( 'toeat_profiler', default=None )
+_log_lock = threading.Lock()
+
+# Profilers abertos que usam o tracemalloc. Uma execução interrompida (rerun do Streamlit) pode
+# não chamar close(); o WeakSet esquece esse profiler quando ele é coletado
+_tracing = weakref.WeakSet()
+_tracing_lock = threading.Lock()
+_started_tracing = False
+
+def _start_tracing(profiler):
+    global _started_tracing
+    with _tracing_lock:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _started_tracing = True
+        _tracing.add( profiler )
+
+def _stop_tracing(profiler=None):
+    """
+    Desliga o tracemalloc quando não há mais profilers abertos (só se foi ligado aqui)
+    """
+    global _started_tracing
+    with _tracing_lock:
+        if profiler is not None:
+            _tracing.discard( profiler )
+        if _started_tracing and len( _tracing ) == 0:
+            tracemalloc.stop()
+            _started_tracing = False
+
+class Profiler:
+    """
+    Guarda, em ordem, as etapas medidas: nome, profundidade, segundos e pico de memória em bytes.
+
+    O tracemalloc é global: com várias sessões medindo ao mesmo tempo, os picos são aproximados.
+    """
+    def __init__(self, page, trace_memory=True):
+        self.page = page
+        self.trace_memory = trace_memory
+        self.records = []
+        self._stack = []
+        self._started = time.perf_counter()
+        self._finished = None
+        if trace_memory:
+            _start_tracing( self )
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        record = {'stage': name, 'depth': len( self._stack ), 'seconds': None, 'peak_bytes': None}
+        self.records.append( record )
+        if self.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            # O pico já visto pela etapa de fora é guardado antes de zerar o pico do tracemalloc
+            if self._stack:
+                self._stack[-1]['max_seen'] = max( self._stack[-1]['max_seen'], peak )
+            tracemalloc.reset_peak()
+            frame = {'start': current, 'max_seen': current}
+        else:
+            frame = {}
+        self._stack.append( frame )
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['seconds'] = time.perf_counter() - start
+            self._stack.pop()
+            if self.trace_memory:
+                frame['max_seen'] = max( frame['max_seen'], tracemalloc.get_traced_memory()[1] )
+                record['peak_bytes'] = frame['max_seen'] - frame['start']
+                if self._stack:
+                    self._stack[-1]['max_seen'] = max( self._stack[-1]['max_seen'], frame['max_seen'] )
+
+    def close(self):
+        """
+        Encerra a medição (fixa o tempo total e libera o tracemalloc)
+        """
+        if self._finished is None:
+            self._finished = time.perf_counter()
+            if self.trace_memory:
+                _stop_tracing( self )
+
+    def total_seconds(self):
+        end = time.perf_counter() if self._finished is None else self._finished
+        return end - self._started
+
+    def report(self):
+        """
+        Esta função monta a tabela das etapas, com o nome recuado pela profundidade
+        (espaço largo U+2003, que a tabela do Streamlit não colapsa)
+        """
+        df = pd.DataFrame( self.records, columns=['stage', 'depth', 'seconds', 'peak_bytes'] )
+        return pd.DataFrame({
+            'etapa': ['\u2003' * depth + name for name, depth in zip( df['stage'], df['depth'] )],
+            'ms': (df['seconds'].astype('float64') * 1000).round( 1 ),
+            'pico MB': (df['peak_bytes'].astype('float64') / 2**20).round( 2 ),
+            })
+
+    def log(self, path):
+        """
+        Esta função acrescenta a execução ao arquivo JSON-lines em path
+        """
+        line = json.dumps({
+            'page': self.page,
+            'date': datetime.datetime.now().isoformat( timespec='milliseconds' ),
+            'total_seconds': round( self.total_seconds(), 6 ),
+            'stages': self.records,
+            }, ensure_ascii=False )
+        with _log_lock, open( path, 'a', encoding='utf-8' ) as file:
+            file.write( line + '\n' )
+
+def current_profiler():
+    return _active.get()
+
+def stage(name):
+    """
+    Marca uma etapa no profiler ativo; sem profiler é um gerenciador de contexto vazio
+    """
+    profiler = _active.get()
+    if profiler is None:
+        return contextlib.nullcontext()
+    return profiler.stage( name )
+
+def timed(name=None):
+    """
+    Decorador que mede cada chamada da função como uma etapa (padrão: o nome da função)
+    """
+    def decorator(func):
+        stage_name = name or func.__name__
+        @functools.wraps( func )
+        def wrapper(*args, **kwargs):
+            with stage( stage_name ):
+                return func( *args, **kwargs )
+        return wrapper
+    return decorator
+
+def profiling_enabled(query_params=None):
+    """
+    Esta função diz se a medição está ligada, pela variável de ambiente ou pelo parâmetro ?profile= da URL
+    """
+    if os.environ.get( PROFILE_ENV, '' ).lower() in ('1', 'true', 'yes'):
+        return True
+    if query_params is not None:
+        return str( query_params.get( PROFILE_QUERY_PARAM, '' ) ).lower() in ('1', 'true', 'yes')
+    return False
+
+def start_page_profiler(page, query_params=None):
+    """
+    Esta função liga o profiler da execução atual da página, se a medição estiver ligada; senão retorna None
+    """
+    previous = _active.get()
+    if previous is not None:
+        # Execução anterior interrompida (ex.: rerun do Streamlit) antes de finish_page_profiler
+        previous.close()
+    if profiling_enabled( query_params ):
+        profiler = Profiler( page )
+    else:
+        profiler = None
+        _stop_tracing()
+    _active.set( profiler )
+    return profiler
+
+def finish_page_profiler():
+    """
+    Esta função encerra o profiler da execução atual: mostra as etapas na barra lateral e grava o log, se configurado
+    """
+    profiler = _active.get()
+    if profiler is None:
+        return None
+    _active.set( None )
+    profiler.close()
+    # Import local: o resto do módulo não depende do Streamlit
+    import streamlit as st
+
+    with st.sidebar.expander( '⏱️ Desempenho desta execução' ):
+        st.markdown( f'Total: {profiler.total_seconds() * 1000:.0f} ms' )
+        st.dataframe( profiler.report(), hide_index=True, use_container_width=True )
+    log_path = os.environ.get( PROFILE_LOG_ENV )
+    if log_path:
+        profiler.log( log_path )
+    return profiler
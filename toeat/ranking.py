@@ -0,0 +1,264 @@
+"""
+Rankings "Top N" das páginas de cidades e culinárias.
+
+top_k escolhe as k primeiras linhas com nlargest/nsmallest, sem ordenar o
+DataFrame inteiro, e desempata de forma determinística. TopKCache guarda o top
+MAX_K (o máximo do slider) de cada estado dos filtros, então mudar o slider de
+10 para 15 é só um head(). GroupTopK também precalcula o top MAX_K de cada
+grupo (país, ou país e culinária). Como cada linha pertence a um único grupo,
+o top de qualquer seleção sai das listas dos grupos selecionados, e o melhor
+de cada culinária (first_per) é a primeira linha de cada uma nessas listas.
+
+CuisineListRankings responde às mesmas consultas da Visão Culinárias contando
+todas as culinárias listadas de cada restaurante, pelo índice invertido de
+all_cuisines (toeat/index.py).
+"""
+import numpy as np
+import pandas as pd
+
+from toeat.cache import LRUCache
+from toeat.cube import build_cube, city_table, concat_like, filter_cube, group_mask, rating_per_cuisine
+from toeat.data import DATASET_PATH, EXCLUDED_CUISINES, load_derived
+from toeat.index import InvertedIndex
+
+# Maior valor do slider "Qual valor?"
+MAX_K = 20
+
+# Quantos estados de filtro cada TopKCache guarda
+MAX_FILTER_STATES = 256
+
+def top_k(df, k, by, ascending=False, tiebreak=()):
+    """
+    Esta função retorna as k linhas com maior (ou menor, com ascending) valor de by.
+
+    Empates em by são resolvidos pelas colunas de tiebreak, em ordem crescente.
+    """
+    tiebreak = list( tiebreak )
+    select = df.nsmallest if ascending else df.nlargest
+    # keep='all' traz todos os empatados do k-ésimo lugar; o desempate escolhe entre eles
+    candidates = select( k, by, keep='all' )
+    return candidates.sort_values( [by] + tiebreak, ascending=[ascending] + [True] * len( tiebreak ), kind='mergesort' ).head( k )
+
+def filter_key(filters):
+    """
+    Chave de cache de um estado dos filtros; a ordem dos valores não importa e None (todos) vira None
+    """
+    return tuple( sorted( (col, None if values is None else tuple( sorted( values ) )) for col, values in filters.items() ) )
+
+class TopKCache:
+    """
+    Guarda compute(MAX_K, **filtros) por estado dos filtros e devolve o head(k) pedido; k maior que MAX_K chama compute(k) sem cache
+    """
+    def __init__(self, compute, max_k=MAX_K):
+        self.compute = compute
+        self.max_k = max_k
+        self._cache = LRUCache( MAX_FILTER_STATES, sizeof=lambda value: 1 )
+
+    def top(self, k, **filters):
+        if k > self.max_k:
+            return self.compute( k, **filters )
+        return self._cache.get_or_create( filter_key( filters ), lambda: self.compute( self.max_k, **filters ) ).head( k )
+
+class GroupTopK:
+    """
+    Top MAX_K de cada grupo, precalculado; consultas juntam só as listas dos grupos selecionados
+    """
+    def __init__(self, df, groups, by, ascending=False, tiebreak=(), max_k=MAX_K):
+        self.groups = list( groups )
+        self.max_k = max_k
+        self.by = by
+        self.ascending = ascending
+        self.tiebreak = list( tiebreak )
+        ranked = df.sort_values( [by] + self.tiebreak, ascending=[ascending] + [True] * len( self.tiebreak ), kind='mergesort' )
+        # head() mantém a ordem do ranking, então self.lists continua ordenado por (by, tiebreak)
+        self.lists = ranked.groupby( list( groups ), observed=True, sort=False ).head( max_k )
+        self._cache = TopKCache( self._compute, max_k )
+        self._first_cache = LRUCache( MAX_FILTER_STATES, sizeof=lambda value: 1 )
+
+    def _select(self, **filters):
+        linhas_selec = pd.Series( True, index=self.lists.index )
+        for col, values in filters.items():
+            if values is not None:
+                linhas_selec &= self.lists[col].isin( values )
+        return self.lists.loc[linhas_selec, :]
+
+    def _compute(self, k, **filters):
+        return top_k( self._select( **filters ), k, self.by, self.ascending, self.tiebreak )
+
+    def top(self, k, **filters):
+        """
+        Esta função retorna o top k das linhas cujos grupos estão nos filtros (ex.: country=[...]).
+
+        As listas só guardam max_k linhas por grupo, então k maior que max_k gera ValueError em vez de um top incompleto.
+        """
+        if k > self.max_k:
+            raise ValueError( f'k deve ser no máximo {self.max_k}, não {k}' )
+        return self._cache.top( k, **filters )
+
+    def first_per(self, column, **filters):
+        """
+        Esta função retorna a primeira linha do ranking para cada valor de column (um dos grupos), indexada por column.
+
+        É uma única passada sobre as listas dos grupos filtrados, guardada por estado dos filtros.
+        """
+        return self._first_cache.get_or_create( (column,) + filter_key( filters ), lambda: self._select( **filters ).drop_duplicates( column ).set_index( column ) )
+
+    def updated(self, df, delta):
+        """
+        Esta função retorna um novo GroupTopK em que só as listas dos grupos afetados pelo delta são refeitas a partir de df
+        """
+        groups = delta.groups( self.groups )
+        kept = self.lists.loc[~group_mask( self.lists, groups ), :]
+        fresh = df.loc[group_mask( df, groups ), list( self.lists.columns )]
+        # As listas mantidas já são o top de cada grupo; reordenar a junção é barato (no máximo max_k linhas por grupo)
+        return GroupTopK( concat_like( [kept, fresh], df ), self.groups, self.by, self.ascending, self.tiebreak, self.max_k )
+
+# ==================================================================
+# Rankings das páginas
+# ==================================================================
+CITY_RANKINGS = ['restaurants', 'rating_above_4', 'rating_below_2_5', 'cuisines']
+
+TOP_RESTAURANT_COLUMNS = ['restaurant_id', 'restaurant_name', 'country', 'city', 'cuisines', 'average_cost_for_two', 'currency', 'aggregate_rating', 'votes']
+
+def build_city_rankings(df1):
+    # Cada cidade pertence a um país, então o top de cada país basta para qualquer seleção de países
+    cities = city_table( build_cube( df1 ) )
+    return {col: GroupTopK( cities.loc[cities[col] > 0, :], ['country'], col, tiebreak=['city', 'country'] ) for col in CITY_RANKINGS}
+
+def load_city_rankings(path=DATASET_PATH):
+    """
+    Esta função retorna os rankings de cidades (um GroupTopK por coluna de CITY_RANKINGS)
+    """
+    return load_derived( 'city_rankings', build_city_rankings, path )
+
+def build_restaurant_rankings(df1):
+    return GroupTopK( df1.loc[:, TOP_RESTAURANT_COLUMNS], ['country', 'cuisines'], 'aggregate_rating', tiebreak=['restaurant_id'] )
+
+def load_restaurant_rankings(path=DATASET_PATH):
+    """
+    Esta função retorna o ranking de restaurantes por nota, com listas por (país, culinária)
+    """
+    return load_derived( 'restaurant_rankings', build_restaurant_rankings, path,
+                         update=lambda rankings, df1, delta: rankings.updated( df1, delta ) )
+
+def build_cuisine_rankings(df1):
+    cube = build_cube( df1 )
+    def compute(ascending):
+        # A nota média de uma culinária mistura vários países, então o top sai do cubo filtrado
+        return lambda k, country, cuisines: top_k( rating_per_cuisine( filter_cube( cube, country, cuisines ) ), k, 'aggregate_rating', ascending, ['cuisines'] )
+    return {'best': TopKCache( compute( False ) ), 'worst': TopKCache( compute( True ) )}
+
+def load_cuisine_rankings(path=DATASET_PATH):
+    """
+    Esta função retorna os rankings de melhores ('best') e piores ('worst') culinárias por nota média
+    """
+    return load_derived( 'cuisine_rankings', build_cuisine_rankings, path )
+
+# ==================================================================
+# Todas as culinárias de cada restaurante
+# ==================================================================
+CUISINE_LIST_COLUMNS = TOP_RESTAURANT_COLUMNS + ['all_cuisines']
+
+class CuisineListRankings:
+    """
+    Rankings da Visão Culinárias em que um restaurante "Italian, Pizza, Cafe" conta nas três culinárias.
+
+    As consultas percorrem os arrays do InvertedIndex de all_cuisines (uma entrada int32 por par
+    restaurante/culinária), sem montar o DataFrame explodido. Os resultados têm o mesmo formato dos
+    rankings de GroupTopK e de rating_per_cuisine; na tabela de restaurantes, cuisines traz a lista completa.
+    """
+    def __init__(self, df1, max_k=MAX_K):
+        self.df1 = df1
+        self.index = InvertedIndex( df1['all_cuisines'], excluded=EXCLUDED_CUISINES )
+        self.value_ids = self.index.value_ids()
+        self.values = np.array( self.index.values, dtype=object )
+        self.rating = df1['aggregate_rating'].to_numpy( dtype=np.float64 )
+        countries = df1['country'].astype( 'category' )
+        self.countries = countries.cat.categories
+        self.country_codes = countries.cat.codes.to_numpy()
+        # Posição de cada linha no ranking por nota, com empates pelo menor restaurant_id (como em GroupTopK)
+        order = np.lexsort( (df1['restaurant_id'].to_numpy(), -self.rating) )
+        self.rank = np.empty( len( df1 ), dtype=np.int32 )
+        self.rank[order] = np.arange( len( df1 ), dtype=np.int32 )
+        self._top = TopKCache( self._compute_top, max_k )
+        self._cuisines = {'best': TopKCache( lambda k, country, cuisines: self._cuisine_top( k, country, cuisines, False ), max_k ),
+                          'worst': TopKCache( lambda k, country, cuisines: self._cuisine_top( k, country, cuisines, True ), max_k )}
+        self._cache = LRUCache( MAX_FILTER_STATES, sizeof=lambda value: 1 )
+
+    def _country_mask(self, countries):
+        if countries is None:
+            return np.ones( len( self.df1 ), dtype=bool )
+        codes = self.countries.get_indexer( list( countries ) )
+        return np.isin( self.country_codes, codes[codes >= 0] )
+
+    def _postings(self, countries, cuisines):
+        """
+        Esta função retorna (linhas, números das culinárias) dos pares restaurante/culinária que passam nos filtros
+        """
+        keep = self._country_mask( countries )[self.index.rows] & self.index.value_mask( cuisines )[self.value_ids]
+        return self.index.rows[keep], self.value_ids[keep]
+
+    def _restaurants(self, positions):
+        df_aux = self.df1.iloc[positions]
+        return df_aux.loc[:, TOP_RESTAURANT_COLUMNS].assign( cuisines=df_aux['all_cuisines'].astype( object ) )
+
+    def _compute_top(self, k, country, cuisines):
+        mask = self._country_mask( country )
+        if cuisines is not None:
+            mask &= self.index.row_mask( cuisines )
+        positions = np.flatnonzero( mask )
+        return self._restaurants( positions[np.argsort( self.rank[positions], kind='stable' )[:k]] )
+
+    def top(self, k, country=None, cuisines=None):
+        """
+        Esta função retorna os k restaurantes mais bem avaliados que listam alguma das culinárias
+        """
+        return self._top.top( k, country=country, cuisines=cuisines )
+
+    def _first_per(self, countries, cuisines):
+        rows, value_ids = self._postings( countries, cuisines )
+        order = np.lexsort( (self.rank[rows], value_ids) )
+        rows, value_ids = rows[order], value_ids[order]
+        first = np.flatnonzero( np.diff( value_ids, prepend=-1 ) != 0 )
+        # Na ordem do ranking, como o first_per de GroupTopK
+        first = first[np.argsort( self.rank[rows[first]], kind='stable' )]
+        df_aux = self.df1.iloc[rows[first]].loc[:, [col for col in TOP_RESTAURANT_COLUMNS if col != 'cuisines']]
+        return df_aux.set_axis( pd.Index( self.values[value_ids[first]], name='cuisines' ) )
+
+    def first_per(self, country=None, cuisines=None):
+        """
+        Esta função retorna o restaurante mais bem avaliado de cada culinária escolhida, indexado por cuisines
+        """
+        key = ('first_per',) + filter_key( {'country': country, 'cuisines': cuisines} )
+        return self._cache.get_or_create( key, lambda: self._first_per( country, cuisines ) )
+
+    def _cuisine_top(self, k, countries, cuisines, ascending):
+        rows, value_ids = self._postings( countries, cuisines )
+        counts = np.bincount( value_ids, minlength=len( self.values ) )
+        sums = np.bincount( value_ids, weights=self.rating[rows], minlength=len( self.values ) )
+        present = counts > 0
+        df_aux = pd.DataFrame( {'cuisines': self.values[present], 'aggregate_rating': sums[present] / counts[present]} )
+        return top_k( df_aux, k, 'aggregate_rating', ascending, ['cuisines'] )
+
+    def cuisine_top(self, ranking, k, country=None, cuisines=None):
+        """
+        Esta função retorna as k culinárias com maior ('best') ou menor ('worst') nota média
+        """
+        return self._cuisines[ranking].top( k, country=country, cuisines=cuisines )
+
+    def options(self, countries=None):
+        """
+        Esta função retorna as culinárias listadas por algum restaurante dos países, na ordem em que aparecem
+        """
+        def compute():
+            rows, value_ids = self._postings( countries, None )
+            first = np.flatnonzero( np.diff( value_ids, prepend=-1 ) != 0 )
+            # As linhas de cada culinária são crescentes: a primeira é onde ela aparece
+            return list( self.values[value_ids[first[np.argsort( rows[first], kind='stable' )]]] )
+        return self._cache.get_or_create( ('options',) + filter_key( {'country': countries} ), compute )
+
+def load_cuisine_list_rankings(path=DATASET_PATH):
+    """
+    Esta função retorna os rankings que contam todas as culinárias de cada restaurante
+    """
+    return load_derived( 'cuisine_list_rankings', CuisineListRankings, path, columns=CUISINE_LIST_COLUMNS )
@@ -0,0 +1,167 @@
+"""
+Schema do dataset: colunas do CSV bruto e schema compacto do dataset limpo (tipos aplicados na carga e colunas lidas por padrão).
+
+CSV_COLUMNS é o mapeamento fixo, com versão, do cabeçalho do CSV do Zomato para
+os nomes usados no pipeline. read_dataset_csv confere o cabeçalho e já lê as
+colunas com esses nomes (names e usecols do read_csv), sem renomear nem copiar
+o DataFrame depois; um cabeçalho diferente do esperado gera SchemaError.
+
+Para ver quantos bytes cada coluna ocupa antes e depois do schema compacto:
+
+    python -m toeat.schema [--csv dataset/zomato.csv]
+"""
+import argparse
+import csv
+
+import pandas as pd
+
+# ==================================================================
+# Colunas do CSV
+# ==================================================================
+# Versão de CSV_COLUMNS: incremente ao mudar o mapeamento (os snapshots gravados com a versão anterior são refeitos)
+CSV_SCHEMA_VERSION = 1
+
+# Cabeçalho do CSV -> nome da coluna no pipeline; None = coluna conferida no cabeçalho, mas não lida
+CSV_COLUMNS = {
+    'Restaurant ID': 'restaurant_id',
+    'Restaurant Name': 'restaurant_name',
+    'Country Code': 'country_code',
+    'City': 'city',
+    'Address': 'address',
+    'Locality': 'locality',
+    'Locality Verbose': 'locality_verbose',
+    'Longitude': 'longitude',
+    'Latitude': 'latitude',
+    'Cuisines': 'cuisines',
+    'Average Cost for two': 'average_cost_for_two',
+    'Currency': 'currency',
+    'Has Table booking': 'has_table_booking',
+    'Has Online delivery': 'has_online_delivery',
+    'Is delivering now': 'is_delivering_now',
+    # Só tem um valor; a limpeza descartava a coluna
+    'Switch to order menu': None,
+    'Price range': 'price_range',
+    'Aggregate rating': 'aggregate_rating',
+    'Rating color': 'rating_color',
+    'Rating text': 'rating_text',
+    'Votes': 'votes',
+    }
+
+# Colunas de texto: lidas sempre como texto, mesmo num bloco em que estejam vazias
+TEXT_COLUMNS = ['restaurant_name', 'city', 'address', 'locality', 'locality_verbose', 'cuisines', 'currency', 'rating_color', 'rating_text']
+
+class SchemaError(ValueError):
+    """
+    Cabeçalho do CSV diferente de CSV_COLUMNS
+    """
+
+def validate_header(header, extra=()):
+    """
+    Esta função confere se o cabeçalho tem exatamente as colunas de CSV_COLUMNS (mais as opcionais de extra), em qualquer ordem
+    """
+    missing = [col for col in CSV_COLUMNS if col not in header]
+    unexpected = [col for col in header if col not in CSV_COLUMNS and col not in extra]
+    repeated = sorted( {col for col in header if header.count( col ) > 1} )
+    if missing or unexpected or repeated:
+        problems = [f'{label}: {cols}' for label, cols in [('faltando', missing), ('inesperadas', unexpected), ('repetidas', repeated)] if cols]
+        raise SchemaError( f'cabeçalho do CSV fora do schema v{CSV_SCHEMA_VERSION}; ' + '; '.join( problems ) )
+    return header
+
+def read_header(path):
+    with open( path, newline='', encoding='utf-8-sig' ) as file:
+        return next( csv.reader( file ), [] )
+
+def read_dataset_csv(path, columns=None, extra=(), **kwargs):
+    """
+    Esta função lê o CSV do Zomato com os nomes de CSV_COLUMNS, conferindo o cabeçalho antes.
+
+    columns limita as colunas lidas (nomes do pipeline); as colunas de extra são aceitas e lidas com o nome original.
+    Os demais argumentos vão para o read_csv (ex.: chunksize).
+    """
+    header = validate_header( read_header( path ), extra )
+    names = [CSV_COLUMNS.get( col ) or col for col in header]
+    usecols = [name for col, name in zip( header, names )
+               if col in extra or (CSV_COLUMNS[col] is not None and (columns is None or name in columns))]
+    dtype = {col: str for col in TEXT_COLUMNS if col in usecols}
+    return pd.read_csv( path, header=0, names=names, usecols=usecols, dtype=dtype, **kwargs )
+
+# ==================================================================
+# Schema compacto
+# ==================================================================
+# Tipos de cada coluna após clean_code; colunas fora do dicionário mantêm o tipo original
+DTYPES = {
+    # int64: os ids do Zomato passam de 19 milhões e os datasets sintéticos maiores passam do int32
+    'restaurant_id': 'int64',
+    'country_code': 'int16',
+    'country': 'category',
+    'city': 'category',
+    'cuisines': 'category',
+    'all_cuisines': 'category',
+    'currency': 'category',
+    'category_price': 'category',
+    'rating_color_name': 'category',
+    'rating_color': 'category',
+    'rating_text': 'category',
+    'price_range': 'int8',
+    'votes': 'int32',
+    'average_cost_for_two': 'int32',
+    'latitude': 'float32',
+    'longitude': 'float32',
+    'aggregate_rating': 'float32',
+    'has_table_booking': 'bool',
+    'has_online_delivery': 'bool',
+    'is_delivering_now': 'bool',
+    }
+
+# Colunas lidas pelas páginas; as demais (address, locality_verbose, rating_text...) só são carregadas quando pedidas
+PAGE_COLUMNS = [
+    'restaurant_id',
+    'restaurant_name',
+    'country',
+    'city',
+    'cuisines',
+    'average_cost_for_two',
+    'currency',
+    'aggregate_rating',
+    'votes',
+    'latitude',
+    'longitude',
+    'rating_color_name',
+    ]
+
+def apply_schema(df1):
+    """
+    Esta função converte as colunas presentes em df1 para os tipos de DTYPES
+    """
+    dtypes = {col: dtype for col, dtype in DTYPES.items() if col in df1.columns and df1[col].dtype != dtype}
+    if not dtypes:
+        return df1
+    return df1.astype( dtypes )
+
+def memory_report(before, after):
+    """
+    Esta função compara os bytes ocupados por coluna (memory_usage deep) entre dois DataFrames
+    """
+    report = pd.concat({
+        'before': before.memory_usage( index=False, deep=True ),
+        'after': after.memory_usage( index=False, deep=True ),
+        }, axis=1).fillna(0).astype('int64')
+    report.loc['total'] = report.sum()
+    report['ratio'] = (report['after'] / report['before']).round(3)
+    return report
+
+def main(argv=None):
+    # Import local: toeat.data importa este módulo
+    from toeat.data import DATASET_PATH, build_dataset
+
+    parser = argparse.ArgumentParser( description='Mostra a memória por coluna antes e depois do schema compacto.' )
+    parser.add_argument( '--csv', default=DATASET_PATH, help='CSV de origem (padrão: %(default)s)' )
+    args = parser.parse_args( argv )
+
+    before = build_dataset( args.csv )
+    after = apply_schema( before )[PAGE_COLUMNS]
+    with pd.option_context( 'display.max_rows', None, 'display.width', 120 ):
+        print( memory_report( before, after ) )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+Snapshot colunar (Feather/Arrow, sem compressão) do dataset limpo.
+
+O snapshot é lido com memory map na inicialização das páginas, evitando
+reprocessar o CSV a cada cold start. Ele é refeito quando o CSV é mais novo,
+quando foi gravado em outro formato (SNAPSHOT_FORMAT) ou com outra regra de
+remoção de duplicadas (TOEAT_DEDUP_RULE, ver toeat/data.py); os dois ficam nos
+metadados do arquivo, junto com quantos deltas (ver toeat/delta.py) já foram
+aplicados sobre ele. Depois de refeito, os deltas registrados são reaplicados
+(replay_pending em toeat/data.py), inclusive quando a causa foi a regra de
+duplicadas: o snapshot do dataset nunca fica só com o CSV.
+Para gerá-lo manualmente:
+
+    python -m toeat.snapshot [--csv dataset/zomato.csv] [--output dataset/zomato.feather]
+"""
+import argparse
+import os
+
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from toeat.schema import CSV_SCHEMA_VERSION, apply_schema
+
+SNAPSHOT_SUFFIX = '.feather'
+
+# Incremente quando as colunas ou a limpeza do dataset limpo mudarem: snapshots de outro formato são refeitos
+SNAPSHOT_VERSION = 5
+SNAPSHOT_FORMAT = f'{SNAPSHOT_VERSION}.{CSV_SCHEMA_VERSION}'.encode()
+FORMAT_KEY = b'toeat_snapshot_format'
+DEDUP_RULE_KEY = b'toeat_dedup_rule'
+DELTAS_KEY = b'toeat_deltas'
+
+def snapshot_path(csv_path):
+    """
+    Retorna o caminho do snapshot correspondente ao CSV (mesmo nome, extensão .feather)
+    """
+    return os.path.splitext( csv_path )[0] + SNAPSHOT_SUFFIX
+
+def with_format(schema, dedup_rule, deltas=0):
+    """
+    Retorna o schema Arrow com o formato do snapshot, a regra de remoção de duplicadas e os deltas aplicados nos metadados
+    """
+    return schema.with_metadata( {**(schema.metadata or {}), FORMAT_KEY: SNAPSHOT_FORMAT, DEDUP_RULE_KEY: dedup_rule.encode(),
+                                  DELTAS_KEY: str( deltas ).encode()} )
+
+def snapshot_metadata(path):
+    # Só o schema é lido (memory map), não as colunas
+    return pa.ipc.open_file( pa.memory_map( path ) ).schema.metadata or {}
+
+def snapshot_format(path):
+    return snapshot_metadata( path ).get( FORMAT_KEY )
+
+def snapshot_dedup_rule(path):
+    """
+    Retorna a regra de remoção de duplicadas com que o snapshot foi gravado (None se não estiver nos metadados)
+    """
+    rule = snapshot_metadata( path ).get( DEDUP_RULE_KEY )
+    return None if rule is None else rule.decode()
+
+def snapshot_deltas(path):
+    """
+    Retorna quantos deltas registrados já estão aplicados no snapshot (None em snapshots gravados antes desse metadado)
+    """
+    deltas = snapshot_metadata( path ).get( DELTAS_KEY )
+    return None if deltas is None else int( deltas )
+
+def snapshot_is_stale(path, csv_path, dedup_rule):
+    """
+    Retorna True quando o snapshot não existe, é mais antigo que o CSV de origem, tem outro formato ou outra regra de duplicadas
+    """
+    if not os.path.exists( path ):
+        return True
+    if os.stat( path ).st_mtime_ns < os.stat( csv_path ).st_mtime_ns:
+        return True
+    metadata = snapshot_metadata( path )
+    return metadata.get( FORMAT_KEY ) != SNAPSHOT_FORMAT or metadata.get( DEDUP_RULE_KEY ) != dedup_rule.encode()
+
+def write_snapshot(df1, path, dedup_rule, deltas=0):
+    """
+    Esta função grava o snapshot de forma atômica (arquivo temporário + rename), já com o schema compacto.
+
+    dedup_rule é a regra de remoção de duplicadas com que df1 foi limpo e deltas quantos deltas registrados
+    df1 já contém (os dois vão para os metadados).
+    """
+    tmp_path = f'{path}.tmp-{os.getpid()}'
+    try:
+        table = pa.Table.from_pandas( apply_schema( df1 ) )
+        feather.write_feather( table.cast( with_format( table.schema, dedup_rule, deltas ) ), tmp_path, compression='uncompressed' )
+        os.replace( tmp_path, path )
+    finally:
+        if os.path.exists( tmp_path ):
+            os.remove( tmp_path )
+    return path
+
+def read_snapshot(path, columns=None):
+    """
+    Esta função lê o snapshot via memory map; colunas numéricas são aproveitadas sem cópia quando possível.
+
+    Com columns, só essas colunas (e o índice) são convertidas para pandas.
+    """
+    table = feather.read_table( path, memory_map=True )
+    if columns is not None:
+        index_columns = [col for col in table.schema.pandas_metadata.get('index_columns', []) if isinstance(col, str)]
+        table = table.select( list( columns ) + index_columns )
+    return table.to_pandas( split_blocks=True )
+
+def main(argv=None):
+    # Import local: toeat.data também importa este módulo
+    from toeat.data import DATASET_PATH, DEDUP_RULE, DEDUP_RULES, build_snapshot, replay_pending
+
+    parser = argparse.ArgumentParser( description='Gera o snapshot colunar do dataset limpo.' )
+    parser.add_argument( '--csv', default=DATASET_PATH, help='CSV de origem (padrão: %(default)s)' )
+    parser.add_argument( '--output', default=None, help='arquivo de saída (padrão: CSV com extensão .feather)' )
+    parser.add_argument( '--dedup-rule', default=DEDUP_RULE, choices=DEDUP_RULES,
+                         help='linha mantida por restaurant_id (padrão: %(default)s)' )
+    args = parser.parse_args( argv )
+
+    report = {}
+    output = build_snapshot( args.csv, args.output, args.dedup_rule, report )
+    # O snapshot do dataset não fica sem os deltas registrados (ver toeat/delta.py)
+    replayed = replay_pending( args.csv, output ) if output == snapshot_path( args.csv ) else 0
+    print( f'Snapshot gravado em {output} ({os.path.getsize( output ) / 1e6:.1f} MB)' )
+    print( f"Duplicadas por restaurant_id ({report['rule']}): {report['collapsed']} de {report['rows_before']} linhas "
+           f"removidas em {report['seconds'] * 1000:.1f} ms" )
+    if replayed:
+        print( f'{replayed} deltas registrados reaplicados' )
+
+if __name__ == '__main__':
+    main()
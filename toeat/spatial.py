@@ -0,0 +1,166 @@
+"""
+Índice espacial das coordenadas dos restaurantes: consultas por janela do mapa, raio e vizinhos mais próximos.
+
+GridIndex divide o globo numa grade de CELL_DEGREES graus e guarda as posições
+(iloc) das linhas ordenadas pela célula. Numa faixa de latitude as células são
+contíguas nessa ordem, então uma janela (bbox) vira um searchsorted por faixa,
+e só as linhas dessas células são comparadas com as coordenadas exatas. O raio
+usa a janela que contém o círculo e a distância haversine; os k mais próximos
+dobram o raio até achar k restaurantes. Janelas que cruzam o antimeridiano
+(west > east) são aceitas.
+
+O índice é montado uma vez por versão do dataset (load_spatial_index), sobre o
+mesmo DataFrame de load_dataset: as posições retornadas valem para ele.
+"""
+import numpy as np
+
+from toeat.data import DATASET_PATH, load_derived
+
+# Lado de cada célula da grade, em graus (~28 km no equador)
+CELL_DEGREES = 0.25
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Meia volta na superfície: nenhum ponto fica mais longe que isso
+MAX_DISTANCE_KM = np.pi * EARTH_RADIUS_KM
+
+def haversine_km(latitude, longitude, latitudes, longitudes):
+    """
+    Esta função retorna a distância em km entre o ponto (latitude, longitude) e cada ponto dos arrays
+    """
+    lat1, lon1 = np.radians( latitude ), np.radians( longitude )
+    lat2, lon2 = np.radians( latitudes ), np.radians( longitudes )
+    a = np.sin( (lat2 - lat1) / 2 ) ** 2 + np.cos( lat1 ) * np.cos( lat2 ) * np.sin( (lon2 - lon1) / 2 ) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin( np.sqrt( np.clip( a, 0, 1 ) ) )
+
+def concat_ranges(starts, ends):
+    """
+    Esta função junta os intervalos [start, end) num único array de índices, sem laço em Python
+    """
+    lengths = ends - starts
+    total = int( lengths.sum() )
+    if total == 0:
+        return np.empty( 0, dtype=np.int64 )
+    offsets = np.repeat( starts - (np.cumsum( lengths ) - lengths), lengths )
+    return np.arange( total, dtype=np.int64 ) + offsets
+
+class GridIndex:
+    """
+    Grade regular de latitude e longitude com as linhas ordenadas por célula
+    """
+    def __init__(self, latitude, longitude, cell_degrees=CELL_DEGREES):
+        latitude = np.asarray( latitude, dtype=np.float64 )
+        longitude = np.asarray( longitude, dtype=np.float64 )
+        self.n_rows = len( latitude )
+        self.cell_degrees = cell_degrees
+        self.grid_rows = int( np.ceil( 180 / cell_degrees ) )
+        self.grid_cols = int( np.ceil( 360 / cell_degrees ) )
+        # Coordenadas fora do globo (ou NaN) não entram no índice
+        valid = np.isfinite( latitude ) & np.isfinite( longitude ) & (np.abs( latitude ) <= 90) & (np.abs( longitude ) <= 180)
+        positions = np.flatnonzero( valid )
+        cells = self._cell( latitude[positions], longitude[positions] )
+        order = np.argsort( cells, kind='stable' )
+        self.positions = positions[order]
+        self.cells = cells[order]
+        self.latitude = latitude[self.positions]
+        self.longitude = longitude[self.positions]
+
+    def __len__(self):
+        return len( self.positions )
+
+    @property
+    def nbytes(self):
+        return self.positions.nbytes + self.cells.nbytes + self.latitude.nbytes + self.longitude.nbytes
+
+    def _grid_row(self, latitude):
+        return np.clip( np.floor( (np.asarray( latitude ) + 90) / self.cell_degrees ), 0, self.grid_rows - 1 ).astype( np.int64 )
+
+    def _grid_col(self, longitude):
+        return np.clip( np.floor( (np.asarray( longitude ) + 180) / self.cell_degrees ), 0, self.grid_cols - 1 ).astype( np.int64 )
+
+    def _cell(self, latitude, longitude):
+        return self._grid_row( latitude ) * self.grid_cols + self._grid_col( longitude )
+
+    def _candidates(self, south, west, north, east):
+        """
+        Esta função retorna os índices (na ordem do índice) das linhas das células que tocam a janela
+        """
+        rows = np.arange( self._grid_row( south ), self._grid_row( north ) + 1 )
+        if west <= east:
+            spans = [(self._grid_col( west ), self._grid_col( east ))]
+        else:
+            spans = [(self._grid_col( west ), self.grid_cols - 1), (0, self._grid_col( east ))]
+        starts = np.concatenate( [np.searchsorted( self.cells, rows * self.grid_cols + first, 'left' ) for first, _ in spans] )
+        ends = np.concatenate( [np.searchsorted( self.cells, rows * self.grid_cols + last, 'right' ) for _, last in spans] )
+        return concat_ranges( starts, ends )
+
+    def _allowed(self, candidates, allowed):
+        if allowed is None:
+            return candidates
+        return candidates[allowed[self.positions[candidates]]]
+
+    def bbox(self, south, west, north, east, allowed=None):
+        """
+        Esta função retorna, em ordem crescente, as posições das linhas dentro da janela.
+
+        allowed é uma máscara opcional por posição (ex.: os países do filtro); west > east cruza o antimeridiano.
+        """
+        if south > north:
+            return np.empty( 0, dtype=np.int64 )
+        candidates = self._allowed( self._candidates( south, west, north, east ), allowed )
+        latitude = self.latitude[candidates]
+        longitude = self.longitude[candidates]
+        inside = (latitude >= south) & (latitude <= north)
+        if west <= east:
+            inside &= (longitude >= west) & (longitude <= east)
+        else:
+            inside &= (longitude >= west) | (longitude <= east)
+        return np.sort( self.positions[candidates[inside]] )
+
+    def radius(self, latitude, longitude, km, allowed=None):
+        """
+        Esta função retorna (posições, distâncias em km) das linhas a até km do ponto, da mais próxima para a mais distante
+        """
+        angle = min( km / EARTH_RADIUS_KM, np.pi )
+        south = latitude - np.degrees( angle )
+        north = latitude + np.degrees( angle )
+        cos_latitude = np.cos( np.radians( latitude ) )
+        if south <= -90 or north >= 90 or np.sin( angle ) >= cos_latitude:
+            # O círculo alcança um polo: todas as longitudes
+            west, east = -180.0, 180.0
+        else:
+            # Maior diferença de longitude dentro do círculo
+            delta = np.degrees( np.arcsin( np.sin( angle ) / cos_latitude ) )
+            west, east = longitude - delta, longitude + delta
+            if west < -180:
+                west += 360
+            if east > 180:
+                east -= 360
+        candidates = self._allowed( self._candidates( max( south, -90 ), west, min( north, 90 ), east ), allowed )
+        distances = haversine_km( latitude, longitude, self.latitude[candidates], self.longitude[candidates] )
+        inside = distances <= km
+        positions = self.positions[candidates[inside]]
+        distances = distances[inside]
+        # Empates de distância pela posição, para o resultado não depender da ordem das células
+        order = np.lexsort( (positions, distances) )
+        return positions[order], distances[order]
+
+    def nearest(self, latitude, longitude, k, allowed=None):
+        """
+        Esta função retorna (posições, distâncias em km) dos k pontos mais próximos, dobrando o raio da busca até achá-los
+        """
+        km = 111.2 * self.cell_degrees
+        while True:
+            positions, distances = self.radius( latitude, longitude, km, allowed )
+            if len( positions ) >= k or km >= MAX_DISTANCE_KM:
+                return positions[:k], distances[:k]
+            km = min( 2 * km, MAX_DISTANCE_KM )
+
+def build_spatial_index(df1):
+    return GridIndex( df1['latitude'], df1['longitude'] )
+
+def load_spatial_index(path=DATASET_PATH):
+    """
+    Esta função retorna o índice espacial do dataset em cache
+    """
+    return load_derived( 'spatial_index', build_spatial_index, path )
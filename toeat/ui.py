@@ -0,0 +1,42 @@
+"""
+Partes da barra lateral repetidas em todas as páginas do Streamlit.
+
+As páginas importam este módulo, toeat.analytics e toeat.charts, e o Streamlit
+só executa o import de cada módulo uma vez por processo. As bibliotecas pesadas
+ficam onde são usadas: o folium só é importado pela Main Page (toeat.maps) e o
+plotly.express só quando uma figura é montada (toeat.charts); o snapshot
+(pyarrow.feather) só na primeira leitura do dataset (toeat.data). Para medir o
+tempo de import das páginas: python -m benchmarks.bench_imports.
+"""
+import functools
+
+import streamlit as st
+
+LOGO_PATH = 'ftcfork4.png'
+
+# Países selecionados ao abrir as páginas
+DEFAULT_COUNTRIES = ['Brazil', 'England', 'Qatar', 'South Africa', 'Canada', 'Australia']
+
+@functools.lru_cache( maxsize=None )
+def logo(path=LOGO_PATH):
+    """
+    Esta função lê o arquivo da logo uma vez por processo
+    """
+    with open( path, 'rb' ) as file:
+        return file.read()
+
+def sidebar_header(filter_title=None):
+    """
+    Esta função mostra a logo, o nome do dashboard e, se houver, o título da seção de filtros na barra lateral
+    """
+    st.sidebar.image( logo(), width=250 )
+    st.sidebar.markdown( '# ToEat Restaurants' )
+    st.sidebar.markdown( """---""" )
+    if filter_title:
+        st.sidebar.markdown( f'# {filter_title}' )
+
+def country_filter(options, label='Escolha os paises que deseja visualizar', default=DEFAULT_COUNTRIES):
+    """
+    Esta função mostra o filtro de países na barra lateral e retorna os países escolhidos
+    """
+    return st.sidebar.multiselect( label, options, default=[country for country in default if country in options] )